@@ -0,0 +1,12 @@
+"""
+Benchmarks for the semantic annotations, run with asv
+
+Run in the Python environment of Sage, from the root of the
+repository, with::
+
+    sage -python -m asv run --python=same
+
+and compare two commits with::
+
+    sage -python -m asv continuous --python=same master HEAD
+"""
@@ -0,0 +1,180 @@
+"""
+Benchmarks of the annotation layer
+
+These measure the paths run in production: importing (and thereby
+monkey patching) the annotations, decorating the annotation modules,
+collecting the semantic of categories, specializing codomains, and
+calling GAP backed methods.
+"""
+
+import os
+import sys
+
+import sage.all
+import sage_annotations
+import sage_annotations.categories.category
+from sage.misc import sage_typing
+
+here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importing Sage dominates the import time; it is done beforehand so
+# that only the import of the annotations is measured
+_import_setup = "import sys; sys.path.insert(0, {!r}); import sage.all".format(here)
+
+def _annotation_modules():
+    """
+    Return the names of the annotation modules, as ``package.module``.
+    """
+    modules = []
+    for package in ["misc", "categories"]:
+        directory = os.path.join(here, "sage_annotations", package)
+        modules.extend(package + "." + filename[:-3]
+                       for filename in sorted(os.listdir(directory))
+                       if filename.endswith(".py") and filename != "__init__.py")
+    return modules
+
+class Import:
+    """
+    Importing ``sage_annotations``, in a fresh interpreter
+    """
+    timeout = 300
+
+    def timeraw_import(self):
+        return "import sage_annotations", _import_setup
+
+    def timeraw_import_lazy(self):
+        return ("import sage_annotations",
+                "import os; os.environ['SAGE_ANNOTATIONS_LAZY'] = '1'; " + _import_setup)
+
+    def track_import_memory(self):
+        import subprocess
+        code = ("import resource; " + _import_setup + "; "
+                "before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss; "
+                "import sage_annotations; "
+                "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)")
+        return int(subprocess.check_output([sys.executable, "-c", code]).split()[-1])
+    track_import_memory.unit = "kilobytes"
+
+class Decoration:
+    """
+    Running the annotation modules, i.e. the ``semantic`` decorators
+    and :func:`~sage.misc.sage_typing.harvest_class`
+
+    The categories registered in the process are discarded afterwards.
+    ``categories.category`` is left out: it holds no annotated
+    category, and running it again would subscribe one more listener
+    to the registry of the annotated categories.
+    """
+    params = [m for m in _annotation_modules()
+              if m.startswith("categories.") and m != "categories.category"]
+    param_names = ["module"]
+
+    def setup(self, module):
+        filename = os.path.join(here, "sage_annotations", *module.split(".")) + ".py"
+        with open(filename) as f:
+            self.code = compile(f.read(), filename, "exec")
+        self.name = "sage_annotations." + module
+
+    def time_decorate(self, module):
+        registered = set(sage_typing.annotated_categories)
+        exec(self.code, {"__name__": self.name})
+        for cls in sage_typing.annotated_categories:
+            if cls not in registered:
+                sage_typing.annotated_categories.unregister(cls)
+
+class MethodDecoration:
+    """
+    Decorating a method with ``semantic``, and computing its arity
+    """
+    def time_semantic(self):
+        def cardinality(self):
+            pass
+        sage_typing.semantic(gap="Size", mmt="cardinality", codomain=sage_typing.Sage)(cardinality)
+
+    def time_semantic_arity(self):
+        def cardinality(self):
+            pass
+        sage_typing.semantic(gap="Size", mmt="cardinality", codomain=sage_typing.Sage)(cardinality).semantic["arity"]
+
+class CollectSemantic:
+    """
+    Collecting the semantic of all the annotated categories
+    """
+    def setup(self):
+        self.categories = []
+        for cls in sage_typing.annotated_categories:
+            try:
+                self.categories.append(cls.an_instance())
+            except (AttributeError, NotImplementedError, TypeError):
+                pass
+
+    def time_collect_semantic_cached(self):
+        for category in self.categories:
+            category.collect_semantic()
+
+    def time_collect_semantic(self):
+        # The cache lives in the annotation module: module level
+        # data is not monkey patched into sage.categories.category
+        sage_annotations.categories.category._collected_semantic.clear()
+        for category in self.categories:
+            category.collect_semantic()
+
+class Specialization:
+    """
+    Specializing dependent codomains
+    """
+    def setup(self):
+        from sage.misc.sage_typing import Facade, Family, List, Self, specialize
+        from sage.sets.finite_enumerated_set import FiniteEnumeratedSet
+        self.specialize = specialize
+        self.types = [Self, List[Self], Family[Self], Facade[Facade[Self]]]
+        self.value = FiniteEnumeratedSet([1, 2, 3])
+
+    def time_specialize_cached(self):
+        for t in self.types:
+            self.specialize(t, self.value)
+
+    def time_specialize(self):
+        for t in self.types:
+            self.value.__dict__.pop("_sage_typing_specializations", None)
+            self.specialize(t, self.value)
+
+class GAPLieAlgebra:
+    """
+    GAP backed methods on ``LieAlgebras(Rings()).GAP().example()``
+    """
+    def setup(self):
+        from sage.categories.lie_algebras import LieAlgebras
+        from sage.categories.rings import Rings
+        self.L = LieAlgebras(Rings()).GAP().example()
+
+    def time_lie_algebra_generators(self):
+        self.L.lie_algebra_generators()
+
+    def time_is_lie_nilpotent(self):
+        self.L.is_lie_nilpotent()
+
+    def time_is_lie_solvable(self):
+        self.L.is_lie_solvable()
+
+class GAPQuiverAlgebra:
+    """
+    GAP backed methods on ``QuiverAlgebras(Rings()).GAP().example()``
+    and its quiver
+    """
+    def setup(self):
+        from mygap import mygap
+        from sage.categories.quiver_algebras import QuiverAlgebras
+        from sage.categories.rings import Rings
+        mygap.LoadPackage("qpa")
+        self.A = QuiverAlgebras(Rings()).GAP().example()
+        self.Q = mygap.Quiver(1, [[1, 1, "a"], [1, 1, "b"]])
+
+    def time_algebra_generators(self):
+        self.A.algebra_generators()
+
+    def time_quiver_vertices(self):
+        self.Q.vertices()
+
+    def time_quiver_arrows(self):
+        self.Q.arrows()
@@ -1,47 +1,76 @@
-"""
+r"""
 Semantic type annotations for the SageMath library
 
     sage: import sage_annotations
-    sage: Semigroups().collect_semantic()
-    {'elements': {'_mul_': {'__imfunc__': <abstract method _mul_ at ...>,
+    sage: Semigroups().collect_semantic(as_dict=True)
+    {'elements': {'_mul_': {'argspec': ...,
+       'arity': 2,
        'codomain': ParentOfSelf,
-       'gap_name': '\\*',
-       'mmt_name': '*'}},
+       'gap': '\\*',
+       'mmt': '*'}},
      'gap': 'IsAssociative',
-     'gap_negation': None,
-     'gap_sub': None,
-     'gap_super': None,
+     ...
      'mmt': 'Semigroup',
      'morphisms': {},
-     'parents': {'__truediv__': ...},
-      '_an_element_': ...},
-      'cardinality': {'__imfunc__': <abstract method cardinality at ...>,
-       'codomain': *.sage(),
-       'gap_name': 'Size',...},
-      'is_d_trivial': ...,
-      'is_finite': ...,
-      'is_l_trivial': ...,
-      'is_r_trivial': ...,
-      'one': ...,
-      'random_element': ...,
-      'semigroup_generators': ...}}
+     'parents': {'__truediv__': ...,
+      '_an_element_': ...,
+      'cardinality': {'argspec': ...,
+       'arity': 1,
+       'codomain': ...,
+       'gap': 'Size'},
+      ...
+      'semigroup_generators': ...},
+     ...}
 """
 
 ##############################################################################
 # Monkey patch the Sage library upon importing this module
 ##############################################################################
+#
+# If the Sage library is imported already, all the annotations are
+# monkey patched into it right away. Otherwise, or if the environment
+# variable SAGE_ANNOTATIONS_LAZY is set (to a non empty value), an
+# import hook is installed instead, and each annotation module is
+# monkey patched into the corresponding Sage module when the latter is
+# first imported; see sage_annotations.import_hook. This way, the
+# modules not depending on Sage (e.g. sage_annotations.snapshot) can
+# be imported without importing the Sage library.
 
 import logging
-from recursive_monkey_patch import monkey_patch
+import os
+import sys
 
 log_level=logging.ERROR
 #log_level=logging.INFO
 
-import sage_annotations.misc
-import sage.misc
-monkey_patch(sage_annotations.misc, sage.misc, log_level=log_level)
+lazy = bool(os.environ.get("SAGE_ANNOTATIONS_LAZY")) or "sage.all" not in sys.modules
+
+def monkey_patch_all():
+    """
+    Monkey patch all the annotations into the Sage library.
+    """
+    from recursive_monkey_patch import monkey_patch
+
+    import sage_annotations.misc
+    import sage.misc
+    monkey_patch(sage_annotations.misc, sage.misc, log_level=log_level)
+
+    import sage_annotations.categories
+    import sage.categories
+    monkey_patch(sage_annotations.categories, sage.categories, log_level=log_level)
+
+def load_all():
+    """
+    Make sure that all the annotations are loaded and monkey patched.
 
-import sage_annotations.categories
-import sage.categories
-monkey_patch(sage_annotations.categories, sage.categories, log_level=log_level)
+    This is a no-op unless in lazy mode, where it forces the import
+    of all the annotated Sage modules.
+    """
+    if lazy:
+        import_hook.install(log_level=log_level).load_all()
 
+if lazy:
+    from sage_annotations import import_hook
+    import_hook.install(log_level=log_level)
+else:
+    monkey_patch_all()
@@ -1,3 +1,6 @@
+from types import MappingProxyType
+
+import sage.misc.sage_typing as sage_typing
 
 nested_classes = {
     "elements": "ElementMethods",
@@ -5,24 +8,84 @@ nested_classes = {
     "morphisms": "MorphismMethods",
 }
 
+# Cache for Category.collect_semantic: category -> collected semantic
+_collected_semantic = {}
+
+def _invalidate_collected_semantic(event, cls):
+    """
+    Discard the collected semantic of the categories having a super
+    category annotated by ``cls``.
+    """
+    for category in list(_collected_semantic):
+        if any(isinstance(C, cls) for C in category.all_super_categories()):
+            del _collected_semantic[category]
+
+sage_typing.annotated_categories.subscribe(_invalidate_collected_semantic)
+
 class Category:
 
-    def collect_semantic(self):
+    def collect_semantic(self, as_dict=False):
+        """
+        Return the semantic information of this category, merged with
+        that of all its super categories.
+
+        INPUT:
+
+        - ``as_dict`` -- a boolean (default: ``False``): whether to
+          return a new dictionary of dictionaries, rather than a
+          read-only view
+
+        The super categories are walked once, from the most general
+        to the most specific in method resolution order, so that
+        annotations in subcategories take precedence. The result is
+        cached, and recomputed whenever the annotations of one of the
+        super categories change. It is read-only, and the semantic
+        records of the methods (see
+        :class:`~sage.misc.sage_typing.MethodSemantic`) are shared
+        with the categories defining them.
+
+        EXAMPLES::
+
+            sage: import sage_annotations
+            sage: S = Semigroups().Finite()
+            sage: S.collect_semantic()['parents']['d_classes']['gap']
+            'GreensDClasses'
+            sage: S.collect_semantic()['parents']['cardinality']['gap']
+            'Size'
+            sage: S.collect_semantic() is S.collect_semantic()
+            True
+            sage: S.collect_semantic()['parents']['d_classes'] is Semigroups.Finite.ParentMethods._semantic['d_classes']
+            True
+            sage: S.collect_semantic()['mmt'] = 'Foo'
+            Traceback (most recent call last):
+            ...
+            TypeError: 'mappingproxy' object does not support item assignment
+
+            sage: S.collect_semantic(as_dict=True)['parents']['d_classes']
+            {'argspec': ..., 'arity': 1, 'codomain': ..., 'cost': 'expensive', 'gap': 'GreensDClasses'}
+        """
+        if as_dict:
+            return {key: ({name: dict(semantic) for (name, semantic) in value.items()}
+                          if key in nested_classes else value)
+                    for (key, value) in self.collect_semantic().items()}
+        cache = _collected_semantic
+        try:
+            return cache[self]
+        except KeyError:
+            pass
         semantic = dict(getattr(self, "_semantic", {}))
         for name in nested_classes.keys():
-            semantic[name] = semantic.get(name, {})
-        for C in self.super_categories():
-            C_semantic = C.collect_semantic()
-            for name in nested_classes.keys():
-                # Could warn if some entry is redefined; this should not happen, right?
-                semantic[name].update(C_semantic[name])
-        # Update
-        for name, clsname in nested_classes.items():
-            cls = getattr(self,clsname, None)
-            if cls is None:
-                continue
-            # Could warn if some entry is redefined; this should not happen, right?
-            semantic[name].update(getattr(cls, "_semantic", {}))
+            semantic[name] = dict(semantic.get(name, {}))
+        for C in reversed(self.all_super_categories()):
+            for name, clsname in nested_classes.items():
+                cls = getattr(C, clsname, None)
+                if cls is None:
+                    continue
+                # Conflicting redefinitions are reported by sage.misc.semantic_check
+                semantic[name].update(cls.__dict__.get("_semantic", {}))
+        for name in nested_classes.keys():
+            semantic[name] = MappingProxyType(semantic[name])
+        semantic = cache[self] = MappingProxyType(semantic)
         return semantic
 
     def _latex_(self):
@@ -1,5 +1,6 @@
 from sage.misc.abstract_method import abstract_method
 from sage.misc.sage_typing import semantic, Facade, Any, Self
+from sage.categories.category_with_axiom import CategoryWithAxiom
 
 @semantic()
 class FiniteGroups:
@@ -37,17 +38,26 @@ class FiniteGroups:
             else:
                 return o()
 
-        @semantic(gap="CharacterTable")
+        @semantic(gap="CharacterTable", cost="expensive")
         @abstract_method
         def character_table(self):
             """Return the character table of self"""
 
-        @semantic(gap="IrreducibleRepresentations", codomain=Facade[Any])
+        @semantic(gap="IrreducibleRepresentations", codomain=Facade[Any], cost="expensive")
         @abstract_method
         def irreducible_representations(self, F):
             """Return the irreducible representations of self"""
 
-        @semantic(gap="ConjugacyClasses", codomain=Facade[Facade[Self]])
+        @semantic(gap="ConjugacyClasses", codomain=Facade[Facade[Self]], cost="expensive")
         @abstract_method
-        def conjugacy_classes(self, F):
+        def conjugacy_classes(self):
             """Return the conjugacy classes of self"""
+
+    class GAP(CategoryWithAxiom):
+        """
+        The category of finite groups which are handles to GAP groups.
+
+        It holds the GAP backed implementations of the annotated
+        methods of finite groups (see
+        :func:`~sage.misc.semantic_codegen.populate_gap_category`).
+        """
@@ -1,5 +1,6 @@
 from sage.misc.sage_typing import semantic, List, Sage, Self
 from sage.misc.abstract_method import abstract_method
+from sage.misc.cachefunc import cached_method
 from sage.categories.category_with_axiom import CategoryWithAxiom
 
 # TODO: Check the consistency with Sage's LieAlgebras category:
@@ -70,10 +71,10 @@ class LieAlgebras:
         False
         sage: L.semi_simple_type()
         'A1'
-        sage: L.chevalley_basis()
-        [ [ LieObject( [ [ 0, 1 ], [ 0, 0 ] ] ) ],
-          [ LieObject( [ [ 0, 0 ], [ 1, 0 ] ] ) ],
-          [ LieObject( [ [ 1, 0 ], [ 0, -1 ] ] ) ] ]
+        sage: [[x.parent() is L for x in l] for l in L.chevalley_basis()]
+        [[True], [True], [True]]
+        sage: L.chevalley_basis() is L.chevalley_basis()
+        True
         sage: L.root_system()
         <mygap.GAPObject object at 0x...>
         sage: L.root_system().gap()
@@ -130,61 +131,70 @@ class LieAlgebras:
             pass
 
         @semantic(mmt="TODO", gap="LieDerivedSubalgebra") # TODO: codomain
-        def lie_derived_subalgebra():
+        def lie_derived_subalgebra(self):
             pass
 
         @semantic(mmt="TODO", gap="LieNilRadical") # TODO: codomain
-        def lie_nilradical():
+        def lie_nilradical(self):
             pass
 
         @semantic(mmt="TODO", gap="LieSolvableRadical") # TODO: codomain
-        def lie_solvable_radical():
+        def lie_solvable_radical(self):
             pass
 
         @semantic(mmt="TODO", gap="CartanSubalgebra") # TODO: codomain
-        def cartan_subalgebra():
+        def cartan_subalgebra(self):
             pass
 
         @semantic(mmt="TODO", gap="LieDerivedSeries", codomain=List)
-        def lie_derived_series():
+        def lie_derived_series(self):
             pass
 
         @semantic(mmt="TODO", gap="LieLowerCentralSeries", codomain=List)
-        def lie_lower_central_series():
+        def lie_lower_central_series(self):
             pass
 
         @semantic(mmt="TODO", gap="LieUpperCentralSeries", codomain=List)
-        def lie_upper_central_series():
+        def lie_upper_central_series(self):
             pass
 
         @semantic(mmt="TODO", gap="IsLieAbelian", codomain=bool)
-        def is_lie_abelian():
+        def is_lie_abelian(self):
             pass
 
         @semantic(mmt="TODO", gap="IsLieNilpotent", codomain=bool)
-        def is_lie_nilpotent():
+        def is_lie_nilpotent(self):
             pass
 
         @semantic(mmt="TODO", gap="IsLieSolvable", codomain=bool)
-        def is_lie_solvable():
+        def is_lie_solvable(self):
             pass
 
         @semantic(mmt="TODO", gap="SemiSimpleType", codomain=Sage)
-        def semi_simple_type():
+        def semi_simple_type(self):
             pass
 
-        # TODO: so far the 2 following methods return GAP objects
+        @semantic(mmt="TODO", gap="ChevalleyBasis", codomain=List[List[Self]], cost="expensive")
+        @abstract_method
+        def chevalley_basis(self):
+            """
+            Return the Chevalley basis of this semisimple Lie algebra.
 
-        @semantic(mmt="TODO", gap="ChevalleyBasis") # TODO: codomain
-        def chevalley_basis():
-            pass
+            OUTPUT: the lists of the positive root vectors, of the
+            negative root vectors, and of the basis of the Cartan
+            subalgebra
+            """
 
-        @semantic(mmt="TODO", gap="RootSystem") # TODO: codomain
-        def root_system():
-            pass
+        # TODO: so far this returns a GAP object
+        @semantic(mmt="TODO", gap="RootSystem", cost="expensive") # TODO: codomain
+        @abstract_method
+        def root_system(self):
+            """
+            Return the root system of this semisimple Lie algebra.
+            """
 
         @semantic(mmt="TODO", gap="IsRestrictedLieAlgebra", codomain=bool)
-        def is_restricted_lie_algebra():
+        def is_restricted_lie_algebra(self):
             pass
 
     class ElementMethods:
@@ -209,3 +219,252 @@ class LieAlgebras:
             b = matrix([[0, 0],
                         [1, 0]])
             return mygap.LieAlgebra( QQ, [a, b] )
+
+        class ParentMethods:
+            def root_system(self):
+                """
+                Return the root system of this semisimple Lie algebra.
+
+                The result is cached (see :mod:`sage.misc.semantic_cache`).
+
+                EXAMPLES::
+
+                    sage: from mmt import LieAlgebras
+                    sage: L = LieAlgebras(Rings()).GAP().example()
+                    sage: L.root_system().gap()
+                    <root system of rank 1>
+                    sage: L.root_system() is L.root_system()
+                    True
+                """
+                from mygap import mygap
+                return mygap.GAPObject(self.gap().RootSystem())
+
+            @cached_method
+            def structure_constants(self, sparse=False):
+                r"""
+                Return the structure constants of this Lie algebra, as a NumPy tensor.
+
+                INPUT:
+
+                - ``sparse`` -- a boolean (default: ``False``): whether to
+                  store them in a SciPy sparse matrix
+
+                The constants are with respect to GAP's basis of this Lie
+                algebra, and extracted from GAP once. Brackets and adjoint
+                matrices can then be computed on coordinate vectors
+                without calling GAP; see
+                :class:`sage.misc.structure_constants.StructureConstants`.
+
+                EXAMPLES::
+
+                    sage: from mmt import LieAlgebras
+                    sage: L = LieAlgebras(Rings()).GAP().example()
+                    sage: C = L.structure_constants(); C
+                    Structure constants of a Lie algebra of dimension 3 (dense, int64)
+                    sage: a, b = L.lie_algebra_generators()
+                    sage: x, y = C.coordinates(a), C.coordinates(b)
+                    sage: (C.bracket(x, y) == C.coordinates(a.gap() * b.gap())).all()
+                    True
+                    sage: import numpy
+                    sage: X = numpy.array([x, y, x + y]); Y = numpy.array([y, x, x - y])
+                    sage: (C.brackets(X, Y) == [C.bracket(u, v) for (u, v) in zip(X, Y)]).all()
+                    True
+                    sage: D = L.structure_constants(sparse=True)
+                    sage: (D.adjoint_matrix(x) == C.adjoint_matrix(x)).all()
+                    True
+
+                The dimension of the derived subalgebra is the rank of the
+                brackets of the basis elements::
+
+                    sage: T = C.tensor()
+                    sage: numpy.linalg.matrix_rank(T.reshape(9, 3)) == L.lie_derived_subalgebra().gap().Dimension()
+                    True
+                """
+                from sage.libs.gap.libgap import libgap
+                from sage.misc.structure_constants import StructureConstants
+                return StructureConstants.from_gap_basis(libgap.Basis(self.gap()), sparse=sparse)
+
+            def _from_gap_bulk_(self, handles):
+                r"""
+                Return the elements of this Lie algebra wrapping the
+                GAP objects in the GAP list ``handles``.
+
+                This is used by the conversion of the results of the
+                annotated methods (see
+                :func:`~sage.misc.semantic_codegen.bulk_elements`).
+                When the elements are Lie matrices, all their matrices
+                are fetched from GAP with a single call and filled
+                into a NumPy array (see
+                :func:`~sage.misc.semantic_codegen.gap_matrices_to_numpy`),
+                so that :meth:`numpy_matrix` does not call GAP again.
+
+                EXAMPLES::
+
+                    sage: from mmt import LieAlgebras
+                    sage: L = LieAlgebras(Rings()).GAP().example()
+                    sage: a, b = L._from_gap_bulk_(L.gap().GeneratorsOfAlgebra())
+                    sage: a.parent() is L
+                    True
+                    sage: b.numpy_matrix()
+                    array([[0, 0],
+                           [1, 0]])
+                """
+                from sage.libs.gap.libgap import libgap
+                from sage.misc.semantic_codegen import gap_matrices_to_numpy, wrap_elements
+                elements = wrap_elements(self, handles)
+                if elements and libgap.ForAll(handles, libgap.IsLieMatrix):
+                    try:
+                        for (x, matrix) in zip(elements, gap_matrices_to_numpy(handles)):
+                            x._numpy_matrix = matrix
+                    except AttributeError:
+                        # Elements without a dictionary compute their matrix on demand
+                        pass
+                return elements
+
+            @cached_method
+            def _lie_series(self, name):
+                """
+                Return the lazily computed series ``name`` of this Lie algebra.
+
+                INPUT:
+
+                - ``name`` -- ``"derived"``, ``"lower_central"`` or ``"upper_central"``
+
+                See :class:`sage.misc.lie_series.LieSeries`.
+                """
+                from mygap import mygap
+                from sage.libs.gap.libgap import libgap
+                import sage.misc.lie_series as lie_series
+                L = self.gap()
+                first = libgap.TrivialSubalgebra(L) if name == "upper_central" else None
+                return lie_series.LieSeries(L, getattr(lie_series, name + "_step"), first=first, wrap=mygap.GAP)
+
+            def lie_derived_series_iterator(self):
+                r"""
+                Iterate through the derived series of this Lie algebra.
+
+                The terms are computed one at a time, each from the
+                previous one, and remembered. This stops before the
+                first term equal to the previous one, as
+                :meth:`lie_derived_series`.
+
+                EXAMPLES::
+
+                    sage: from mmt import LieAlgebras
+                    sage: L = LieAlgebras(Rings()).GAP().example()
+                    sage: list(L.lie_derived_series_iterator())
+                    [<Lie algebra of dimension 3 over Rationals>]
+                    sage: len(list(L.lie_derived_series_iterator())) == len(L.lie_derived_series())
+                    True
+                """
+                return iter(self._lie_series("derived"))
+
+            def lie_lower_central_series_iterator(self):
+                r"""
+                Iterate through the lower central series of this Lie algebra.
+
+                See :meth:`lie_derived_series_iterator`.
+
+                EXAMPLES::
+
+                    sage: from mmt import LieAlgebras
+                    sage: L = LieAlgebras(Rings()).GAP().example()
+                    sage: next(L.lie_lower_central_series_iterator())
+                    <Lie algebra of dimension 3 over Rationals>
+                """
+                return iter(self._lie_series("lower_central"))
+
+            def lie_upper_central_series_iterator(self):
+                r"""
+                Iterate through the upper central series of this Lie algebra.
+
+                The terms are in increasing order, starting from the
+                trivial subalgebra, which is the reverse of the order
+                of :meth:`lie_upper_central_series`. See
+                :meth:`lie_derived_series_iterator`.
+
+                EXAMPLES::
+
+                    sage: from mmt import LieAlgebras
+                    sage: L = LieAlgebras(Rings()).GAP().example()
+                    sage: list(L.lie_upper_central_series_iterator())
+                    [<Lie algebra of dimension 0 over Rationals>]
+                """
+                return iter(self._lie_series("upper_central"))
+
+            def is_lie_solvable(self):
+                r"""
+                Return whether this Lie algebra is solvable.
+
+                This computes the derived series until it reaches
+                `0` or stabilizes, unless GAP already knows the answer,
+                and tells GAP the answer.
+
+                EXAMPLES::
+
+                    sage: from mmt import LieAlgebras
+                    sage: L = LieAlgebras(Rings()).GAP().example()
+                    sage: L.is_lie_solvable()
+                    False
+                    sage: L._lie_series("derived").dimensions()
+                    [3]
+                """
+                from sage.libs.gap.libgap import libgap
+                L = self.gap()
+                if libgap.HasIsLieSolvable(L):
+                    return L.IsLieSolvable().sage()
+                result = self._lie_series("derived").last_dimension() == 0
+                libgap.SetIsLieSolvable(L, result)
+                return result
+
+            def is_lie_nilpotent(self):
+                r"""
+                Return whether this Lie algebra is nilpotent.
+
+                This computes the lower central series until it
+                reaches `0` or stabilizes; see :meth:`is_lie_solvable`.
+
+                EXAMPLES::
+
+                    sage: from mmt import LieAlgebras
+                    sage: L = LieAlgebras(Rings()).GAP().example()
+                    sage: L.is_lie_nilpotent()
+                    False
+                """
+                from sage.libs.gap.libgap import libgap
+                L = self.gap()
+                if libgap.HasIsLieNilpotent(L):
+                    return L.IsLieNilpotent().sage()
+                result = self._lie_series("lower_central").last_dimension() == 0
+                libgap.SetIsLieNilpotent(L, result)
+                return result
+
+        class ElementMethods:
+            def numpy_matrix(self):
+                """
+                Return the matrix of this element of a Lie algebra of
+                matrices, as a NumPy array.
+
+                The matrices of the elements obtained from annotated
+                methods are fetched in bulk (see
+                :meth:`LieAlgebras.GAP.ParentMethods._from_gap_bulk_`).
+
+                EXAMPLES::
+
+                    sage: from mmt import LieAlgebras
+                    sage: L = LieAlgebras(Rings()).GAP().example()
+                    sage: a, b = L.lie_algebra_generators()
+                    sage: a.numpy_matrix()
+                    array([[0, 1],
+                           [0, 0]])
+                """
+                try:
+                    return self._numpy_matrix
+                except AttributeError:
+                    pass
+                from sage.libs.gap.libgap import libgap
+                from sage.misc.semantic_codegen import gap_matrices_to_numpy
+                handle = self.gap()
+                if not libgap.IsLieMatrix(handle):
+                    raise ValueError("{} is not a matrix".format(self))
+                return gap_matrices_to_numpy(libgap([handle]))[0]
@@ -1,6 +1,8 @@
 from sage.misc.abstract_method import abstract_method
-from sage.misc.sage_typing import semantic, Facade, Family, Self
+from sage.misc.cachefunc import cached_method
+from sage.misc.sage_typing import semantic, Facade, Family, Sage, Self
 from sage.categories.category import Category
+from sage.categories.category_with_axiom import CategoryWithAxiom
 import sage.categories.sets_cat
 import sage.categories.semigroups
 
@@ -35,6 +37,118 @@ class Semigroups:
     @semantic()
     class Finite:
         class ParentMethods:
+            @cached_method
+            def froidure_pin(self):
+                """
+                Return the Froidure-Pin enumeration of this semigroup.
+
+                See :class:`sage.misc.froidure_pin.FroidurePin`. For a
+                monoid, the enumeration is from its monoid generators,
+                with its identity as element ``0``.
+
+                EXAMPLES::
+
+                    sage: import sage_annotations
+                    sage: S = FiniteSemigroups().example(alphabet=('a','b','c'))
+                    sage: F = S.froidure_pin(); F
+                    Froidure-Pin enumeration of a semigroup with 15 elements and 3 generators
+                    sage: S.froidure_pin() is F
+                    True
+                """
+                from sage.misc.froidure_pin import FroidurePin
+                from sage.categories.monoids import Monoids
+                if self in Monoids():
+                    try:
+                        return FroidurePin(self.monoid_generators(), one=self.one())
+                    except (AttributeError, NotImplementedError):
+                        pass
+                return FroidurePin(self.semigroup_generators())
+
+            def is_l_trivial(self):
+                """
+                Return whether all the `L`-classes of this semigroup are trivial.
+
+                EXAMPLES::
+
+                    sage: import sage_annotations
+                    sage: S = FiniteSemigroups().example(alphabet=('a','b','c'))
+                    sage: S.is_l_trivial(), S.is_r_trivial(), S.is_d_trivial()
+                    (False, True, False)
+                """
+                return self.froidure_pin().is_l_trivial()
+
+            def is_r_trivial(self):
+                """
+                Return whether all the `R`-classes of this semigroup are trivial.
+                """
+                return self.froidure_pin().is_r_trivial()
+
+            def is_d_trivial(self):
+                """
+                Return whether all the `D`-classes of this semigroup are trivial.
+                """
+                return self.froidure_pin().is_d_trivial()
+
+            def cayley_graph(self, side="right", simple=False, elements=None, generators=None, connecting_set=None):
+                """
+                Return the Cayley graph of this semigroup.
+
+                INPUT: as for :meth:`Semigroups.ParentMethods.cayley_graph`
+
+                Unless ``elements``, ``generators`` or
+                ``connecting_set`` are specified, the graph is built
+                from the Cayley graphs computed by :meth:`froidure_pin`;
+                otherwise, this resorts to the generic implementation,
+                whose vertices are all the elements of this semigroup.
+
+                EXAMPLES::
+
+                    sage: import sage_annotations
+                    sage: S = FiniteSemigroups().example(alphabet=('a','b'))
+                    sage: G = S.cayley_graph(); G
+                    Looped multi-digraph on 4 vertices
+                    sage: G.num_edges()
+                    8
+                    sage: G == Semigroups().parent_class.cayley_graph(S)
+                    True
+                """
+                if elements is not None or generators is not None or connecting_set is not None:
+                    return sage.categories.semigroups.Semigroups().parent_class.cayley_graph(
+                        self, side=side, simple=simple, elements=elements,
+                        generators=generators, connecting_set=connecting_set)
+                return self.froidure_pin().cayley_graph(side=side, simple=simple)
+
+            @cached_method
+            def indexed_multiplication_table(self, directory=None):
+                """
+                Return the multiplication table of this semigroup, stored on disk.
+
+                INPUT:
+
+                - ``directory`` -- a directory name (default: the
+                  subdirectory ``multiplication_tables`` of ``DOT_SAGE``)
+
+                The elements are indexed as in :meth:`froidure_pin`.
+                The table is computed in blocks into a memory-mapped
+                file, which is reused by later sessions; see
+                :class:`sage.misc.multiplication_table.MultiplicationTable`.
+                Unlike :meth:`multiplication_table`, it never holds the
+                whole table in memory.
+
+                EXAMPLES::
+
+                    sage: import sage_annotations, tempfile
+                    sage: S = FiniteSemigroups().example(alphabet=('a','b','c'))
+                    sage: T = S.indexed_multiplication_table(directory=tempfile.mkdtemp()); T
+                    Multiplication table of a semigroup with 15 elements
+                    sage: F = S.froidure_pin()
+                    sage: [F.element(i) for i in T.column(F.index(S('b')))][:4]
+                    ['ab', 'b', 'cb', 'ab']
+                    sage: T.product(S('ab'), S('c'))
+                    'abc'
+                """
+                from sage.misc.multiplication_table import MultiplicationTable
+                return MultiplicationTable(self.froidure_pin(), directory=directory)
 
             # @semantic(gap="MultiplicationTable",
             #           hightlight=lambda self: self.cardinality() < 27,
@@ -49,32 +163,32 @@ class Semigroups:
             def group_of_units(self):
                 """Return the group of units of this semigroup"""
 
-            @semantic(gap="GreensLClasses", codomain=Facade[Facade[Self]])
+            @semantic(gap="GreensLClasses", codomain=Facade[Facade[Self]], cost="expensive")
             @abstract_method
             def l_classes(self):
                 pass
 
-            @semantic(gap="GreensRClasses", codomain=Facade[Facade[Self]])
+            @semantic(gap="GreensRClasses", codomain=Facade[Facade[Self]], cost="expensive")
             @abstract_method
             def r_classes(self):
                 pass
 
-            @semantic(gap="GreensJClasses", codomain=Facade[Facade[Self]])
+            @semantic(gap="GreensJClasses", codomain=Facade[Facade[Self]], cost="expensive")
             @abstract_method
             def j_classes(self):
                 pass
 
-            @semantic(gap="GreensDClasses", codomain=Facade[Facade[Self]])
+            @semantic(gap="GreensDClasses", codomain=Facade[Facade[Self]], cost="expensive")
             @abstract_method
             def d_classes(self):
                 pass
 
-            @semantic(gap="StructureDescriptionMaximalSubgroups")
+            @semantic(gap="StructureDescriptionMaximalSubgroups", codomain=Sage, cost="expensive")
             @abstract_method
             def structure_description_maximal_subgroups(self):
                 pass
 
-            @semantic(gap="StructureDescriptionSchutzenbergerGroups")
+            @semantic(gap="StructureDescriptionSchutzenbergerGroups", codomain=Sage, cost="expensive")
             @abstract_method
             def structure_description_schutzenberger_groups(self):
                 pass
@@ -84,6 +198,16 @@ class Semigroups:
             def isomorphism_transformation_semigroup(self):
                 pass
 
+        class GAP(CategoryWithAxiom):
+            """
+            The category of finite semigroups which are handles to GAP
+            semigroups.
+
+            It holds the GAP backed implementations of the annotated
+            methods of finite semigroups (see
+            :func:`~sage.misc.semantic_codegen.populate_gap_category`).
+            """
+
     @semantic(gap="IsMonoidAsSemigroup")
     class Unital:
         class ParentMethods:
@@ -93,7 +217,8 @@ class Semigroups:
                 pass
 
             def cayley_graph(self, side="right", simple=False, elements = None, generators = None, connecting_set = None):
-                if generators is None:
+                # Otherwise the Froidure-Pin enumeration picks the monoid generators
+                if generators is None and (elements is not None or connecting_set is not None):
                     try:
                         generators = self.monoid_generators()
                     except NotImplementedError:
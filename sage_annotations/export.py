@@ -0,0 +1,291 @@
+r"""
+Exporting the semantic annotations to MMT/OMDoc and JSON
+
+The annotations of all the annotated categories and of their methods
+are streamed, one category at a time, either as newline delimited
+JSON (:func:`export_ndjson`) or as an OMDoc document
+(:func:`export_omdoc`). Codomains are rendered canonically by
+:func:`sage.misc.sage_typing.type_repr`.
+
+Each exported category carries a digest of its annotations and of
+those of its methods. Given the digests of a previous export (see
+:func:`read_digests`), only the categories that changed since are
+exported in full; the others are listed with their digests only,
+and the categories that were removed with their keys. An
+incremental export thus holds the digests of all the categories, and
+can serve in turn as the base of the next one.
+
+Categories are identified by their key, that is the qualified name
+``module.qualname`` of their class, since several categories may
+have the same name.
+
+EXAMPLES::
+
+    sage: import io
+    sage: from sage_annotations import export
+    sage: stream = io.StringIO()
+    sage: digests = export.export_ndjson(stream)
+    sage: print(stream.getvalue())
+    {"digest": "...", "gap": "IsAssociative", ..., "name": "Semigroups", ..., "type": "category", "variant": "multiplicative"}
+    {"arity": 1, "category": "Semigroups", "codomain": "Family[Self]", "gap": "GeneratorsOfSemigroup", ..., "name": "semigroup_generators", "nested_class": "ParentMethods", "type": "method"}
+    ...
+
+Only the digests are exported when nothing changed::
+
+    sage: import json
+    sage: stream = io.StringIO()
+    sage: export.export_ndjson(stream, since=digests) == digests
+    True
+    sage: set(json.loads(line)["type"] for line in stream.getvalue().splitlines())
+    {'unchanged'}
+
+and they are read back as the base of the next export::
+
+    sage: import os, tempfile
+    sage: filename = os.path.join(tempfile.mkdtemp(), "annotations.ndjson")
+    sage: with open(filename, "w") as f:
+    ....:     _ = f.write(stream.getvalue())
+    sage: export.read_digests(filename) == digests
+    True
+    sage: digests["sage.categories.semigroups.Semigroups"]
+    '...'
+
+The OMDoc export holds one theory per category::
+
+    sage: stream = io.StringIO()
+    sage: digests = export.export_omdoc(stream)
+    sage: print(stream.getvalue())
+    <?xml version="1.0" encoding="UTF-8"?>
+    <omdoc xmlns="http://omdoc.org/ns" xmlns:sage="https://github.com/nthiery/sage-semantic-annotations">
+    ...
+      <theory name="Semigroups" sage:module="sage.categories.semigroups" sage:qualname="Semigroups" sage:digest="..." sage:mmt="Semigroup" sage:gap="IsAssociative" sage:variant="multiplicative">
+        <constant name="ParentMethods.semigroup_generators" sage:gap="GeneratorsOfSemigroup" sage:codomain="Family[Self]" sage:arity="1"/>
+    ...
+      </theory>
+    ...
+    </omdoc>
+"""
+
+import hashlib
+import json
+from xml.sax.saxutils import quoteattr
+
+category_fields = ["mmt", "gap", "gap_sub", "gap_super", "gap_negation", "variant"]
+method_fields = ["gap", "mmt", "codomain", "arity"]
+# Entries of the semantic which are not exported as such
+ignored_fields = {"argspec", "__imfunc__"}
+
+OMDOC_NAMESPACE = "http://omdoc.org/ns"
+SAGE_NAMESPACE = "https://github.com/nthiery/sage-semantic-annotations"
+
+def _simple(value):
+    return value is None or isinstance(value, (str, int, float, bool))
+
+def _key(category):
+    """
+    Return the key of the record ``category``, that is the qualified
+    name of its class.
+    """
+    return category["module"] + "." + category["qualname"]
+
+def records():
+    """
+    Iterate through the annotations, one category at a time.
+
+    OUTPUT: pairs ``(category, methods)`` of a dictionary describing
+    an annotated category, and of the list of dictionaries describing
+    its annotated methods; the category dictionary includes the
+    ``digest`` of both
+
+    This loads all the annotations, which requires the Sage library.
+    """
+    import sage_annotations
+    sage_annotations.load_all()
+    from sage.misc.sage_typing import annotated_categories, annotated_methods, type_repr
+    seen = set()
+    for cls in annotated_categories:
+        if cls in seen:
+            continue
+        seen.add(cls)
+        semantic = cls.__dict__.get("_semantic", {})
+        category = {"name": cls.__name__, "module": cls.__module__, "qualname": cls.__qualname__}
+        for (key, value) in semantic.items():
+            if key not in ignored_fields and _simple(value):
+                category[key] = value
+        methods = []
+        for (_, nested_class, name, semantic) in annotated_methods([cls]):
+            method = {"category": cls.__name__, "nested_class": nested_class, "name": name}
+            for (key, value) in semantic.items():
+                if key == "codomain" and value is not None:
+                    method[key] = type_repr(value)
+                elif key not in ignored_fields and _simple(value):
+                    method[key] = value
+            methods.append(method)
+        digest = hashlib.sha256()
+        digest.update(json.dumps(category, sort_keys=True).encode("utf-8"))
+        for method in methods:
+            digest.update(json.dumps(method, sort_keys=True).encode("utf-8"))
+        category["digest"] = digest.hexdigest()
+        yield (category, methods)
+
+def _changed(since):
+    """
+    Iterate through the records of the categories changed since the
+    export with digests ``since``.
+
+    Fill ``digests`` along the way; return them at the end, together
+    with the keys of the unchanged and of the removed categories.
+    """
+    digests = {}
+    unchanged = []
+    for (category, methods) in records():
+        key = _key(category)
+        digests[key] = category["digest"]
+        if since is None or since.get(key) != category["digest"]:
+            yield (category, methods)
+        else:
+            unchanged.append(key)
+    removed = [] if since is None else sorted(set(since) - set(digests))
+    return (digests, unchanged, removed)
+
+def export_ndjson(stream, since=None):
+    """
+    Write the annotations to ``stream`` as newline delimited JSON.
+
+    INPUT:
+
+    - ``stream`` -- a text file
+    - ``since`` -- a dictionary mapping category keys to digests
+      (default: ``None``), as returned by a previous export or by
+      :func:`read_digests`; if specified, only the categories whose
+      digest changed are exported in full
+
+    OUTPUT: the digests of all the categories
+
+    Each line is a JSON object with a ``type``: ``"category"``,
+    followed by a ``"method"`` line for each of its annotated methods;
+    or, when ``since`` is specified, ``"unchanged"``, with the ``key``
+    and the ``digest`` of a category which did not change, or
+    ``"removed"``, with the ``key`` of a category which is no longer
+    annotated.
+    """
+    changed = _changed(since)
+    while True:
+        try:
+            (category, methods) = next(changed)
+        except StopIteration as stop:
+            (digests, unchanged, removed) = stop.value
+            break
+        stream.write(json.dumps(dict(category, type="category"), sort_keys=True))
+        stream.write("\n")
+        for method in methods:
+            stream.write(json.dumps(dict(method, type="method"), sort_keys=True))
+            stream.write("\n")
+    for key in unchanged:
+        stream.write(json.dumps({"type": "unchanged", "key": key, "digest": digests[key]}, sort_keys=True))
+        stream.write("\n")
+    for key in removed:
+        stream.write(json.dumps({"type": "removed", "key": key}, sort_keys=True))
+        stream.write("\n")
+    return digests
+
+def _attributes(record, keys):
+    return "".join(" sage:{}={}".format(key, quoteattr(str(record[key])))
+                   for key in keys if record.get(key) is not None)
+
+def export_omdoc(stream, since=None):
+    """
+    Write the annotations to ``stream`` as an OMDoc document.
+
+    INPUT: as for :func:`export_ndjson`
+
+    OUTPUT: the digests of all the categories
+
+    Each annotated category is exported as a theory, and each of its
+    annotated methods as a constant named ``NestedClass.method``; the
+    annotations are attributes in the namespace
+    :data:`SAGE_NAMESPACE`. Unchanged categories are listed, with
+    their digests, as ``sage:unchanged`` elements, and removed
+    categories as ``sage:removed`` elements.
+    """
+    stream.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    stream.write('<omdoc xmlns="{}" xmlns:sage="{}">\n'.format(OMDOC_NAMESPACE, SAGE_NAMESPACE))
+    changed = _changed(since)
+    while True:
+        try:
+            (category, methods) = next(changed)
+        except StopIteration as stop:
+            (digests, unchanged, removed) = stop.value
+            break
+        other_keys = sorted(key for key in category
+                            if key not in category_fields and key not in ("name", "module", "qualname", "digest"))
+        stream.write('  <theory name={} sage:module={} sage:qualname={} sage:digest={}{}>\n'.format(
+            quoteattr(category["name"]), quoteattr(category["module"]), quoteattr(category["qualname"]),
+            quoteattr(category["digest"]), _attributes(category, category_fields + other_keys)))
+        for method in methods:
+            other_keys = sorted(key for key in method
+                                if key not in method_fields and key not in ("category", "nested_class", "name"))
+            stream.write('    <constant name={}{}/>\n'.format(
+                quoteattr(method["nested_class"] + "." + method["name"]),
+                _attributes(method, method_fields + other_keys)))
+        stream.write('  </theory>\n')
+    for key in unchanged:
+        stream.write('  <sage:unchanged sage:key={} sage:digest={}/>\n'.format(
+            quoteattr(key), quoteattr(digests[key])))
+    for key in removed:
+        stream.write('  <sage:removed sage:key={}/>\n'.format(quoteattr(key)))
+    stream.write('</omdoc>\n')
+    return digests
+
+def read_digests(filename):
+    """
+    Return the digests of the categories in a previous export.
+
+    INPUT:
+
+    - ``filename`` -- the name of a file written by
+      :func:`export_ndjson` or :func:`export_omdoc` (recognized by
+      the extension ``.omdoc``)
+
+    OUTPUT: a dictionary mapping category keys to digests
+
+    An incremental export lists the unchanged categories with their
+    digests, so that this returns the digests of all the categories
+    in either case.
+    """
+    digests = {}
+    if filename.endswith(".omdoc"):
+        import xml.etree.ElementTree as ElementTree
+        theory = "{{{}}}theory".format(OMDOC_NAMESPACE)
+        unchanged = "{{{}}}unchanged".format(SAGE_NAMESPACE)
+        module = "{{{}}}module".format(SAGE_NAMESPACE)
+        qualname = "{{{}}}qualname".format(SAGE_NAMESPACE)
+        key = "{{{}}}key".format(SAGE_NAMESPACE)
+        digest = "{{{}}}digest".format(SAGE_NAMESPACE)
+        for (event, element) in ElementTree.iterparse(filename):
+            if element.tag == theory:
+                digests[element.get(module) + "." + element.get(qualname)] = element.get(digest)
+                element.clear()
+            elif element.tag == unchanged:
+                digests[element.get(key)] = element.get(digest)
+        return digests
+    with open(filename) as f:
+        for line in f:
+            record = json.loads(line)
+            if record["type"] == "category":
+                digests[_key(record)] = record["digest"]
+            elif record["type"] == "unchanged":
+                digests[record["key"]] = record["digest"]
+    return digests
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m sage_annotations.export",
+                                     description="Export the semantic annotations")
+    parser.add_argument("filename", help="the output file; OMDoc if it ends with .omdoc, and NDJSON otherwise")
+    parser.add_argument("--since", help="a previous export; only the categories changed since are exported")
+    arguments = parser.parse_args()
+    since = read_digests(arguments.since) if arguments.since else None
+    export = export_omdoc if arguments.filename.endswith(".omdoc") else export_ndjson
+    with open(arguments.filename, "w", encoding="utf-8") as f:
+        export(f, since=since)
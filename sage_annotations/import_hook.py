@@ -0,0 +1,177 @@
+"""
+Deferred monkey patching of the Sage library
+
+In lazy mode (see :mod:`sage_annotations`), the annotations are not
+inserted into the Sage library upon importing :mod:`sage_annotations`.
+Instead, a meta path finder is installed, and each module
+``sage_annotations.<package>.<mod>`` is monkey patched into
+``sage.<package>.<mod>`` right after the latter has been imported.
+Annotation modules with no counterpart in the Sage library (e.g.
+:mod:`sage_annotations.misc.sage_typing`) are imported under their
+Sage name upon first import of the latter.
+
+Modules that are already imported when the hook is installed are
+patched right away.
+
+This module does not import the Sage library by itself.
+
+EXAMPLES::
+
+    sage: from sage_annotations.import_hook import AnnotationsFinder
+    sage: finder = AnnotationsFinder(["misc", "categories"])
+    sage: finder.targets["sage.categories.semigroups"]
+    'sage_annotations.categories.semigroups'
+    sage: finder.targets["sage.misc.sage_typing"]
+    'sage_annotations.misc.sage_typing'
+"""
+
+import importlib
+import importlib.abc
+import importlib.util
+import logging
+import os
+import pkgutil
+import sys
+
+class PatchingLoader(importlib.abc.Loader):
+    """
+    A loader wrapping that of a Sage module, and monkey patching the
+    corresponding annotation module into it once it is executed.
+    """
+    def __init__(self, loader, source, finder):
+        self._loader = loader
+        self._source = source
+        self._finder = finder
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._loader.exec_module(module)
+        self._finder.patch(module.__name__, module)
+
+    def __getattr__(self, name):
+        # get_source, get_filename, ...: needed e.g. by sage_getargspec
+        return getattr(self._loader, name)
+
+class AliasingLoader(importlib.abc.Loader):
+    """
+    A loader for an annotation module imported under its Sage name
+
+    The annotation module is also registered in ``sys.modules`` under
+    its original name, so that it is not imported twice.
+    """
+    def __init__(self, loader, source):
+        self._loader = loader
+        self._source = source
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        sys.modules[self._source] = module
+        try:
+            self._loader.exec_module(module)
+        except BaseException:
+            del sys.modules[self._source]
+            raise
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+class AnnotationsFinder(importlib.abc.MetaPathFinder):
+    r"""
+    A meta path finder monkey patching the annotations into the Sage
+    library on demand
+
+    INPUT:
+
+    - ``packages`` -- a list of names of subpackages of both
+      :mod:`sage_annotations` and :mod:`sage` (e.g. ``"categories"``)
+    - ``log_level`` -- a :mod:`logging` level, passed down to :func:`monkey_patch`
+    """
+    def __init__(self, packages, log_level=logging.ERROR):
+        self.log_level = log_level
+        # target module name -> source module name
+        self.targets = {}
+        # target module name -> path of the source file
+        self._files = {}
+        here = os.path.dirname(__file__)
+        for package in packages:
+            path = os.path.join(here, package)
+            for (module_finder, name, ispkg) in pkgutil.iter_modules([path]):
+                target = "sage.{}.{}".format(package, name)
+                self.targets[target] = "sage_annotations.{}.{}".format(package, name)
+                self._files[target] = module_finder.find_spec(name).origin
+        self._busy = set()
+        self.patched = set()
+
+    def find_spec(self, fullname, path, target=None):
+        source = self.targets.get(fullname)
+        if source is None or fullname in self._busy:
+            return None
+        self._busy.add(fullname)
+        spec = None
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+        finally:
+            self._busy.discard(fullname)
+        if spec is not None:
+            spec.loader = PatchingLoader(spec.loader, source, self)
+            return spec
+        # No such module in Sage: import the annotation module in its place
+        spec = importlib.util.spec_from_file_location(fullname, self._files[fullname])
+        spec.loader = AliasingLoader(spec.loader, source)
+        return spec
+
+    def patch(self, name, module):
+        """
+        Monkey patch the annotation module for ``name`` into ``module``.
+        """
+        if name in self.patched:
+            return
+        self.patched.add(name)
+        if sys.modules.get(self.targets[name]) is module:
+            # An annotation module imported under its Sage name
+            return
+        from recursive_monkey_patch import monkey_patch
+        source = importlib.import_module(self.targets[name])
+        monkey_patch(source, module, log_level=self.log_level)
+
+    def patch_imported(self):
+        """
+        Monkey patch the annotations into the already imported Sage modules.
+        """
+        # misc first, as the annotations of categories depend on sage.misc.sage_typing
+        for name in sorted(self.targets, key=lambda name: not name.startswith("sage.misc.")):
+            module = sys.modules.get(name)
+            if module is not None and module.__name__ == name:
+                self.patch(name, module)
+
+    def load_all(self):
+        """
+        Import (and thereby monkey patch) all annotated Sage modules.
+        """
+        for name in sorted(self.targets, key=lambda name: not name.startswith("sage.misc.")):
+            importlib.import_module(name)
+
+def install(packages=("misc", "categories"), log_level=logging.ERROR):
+    """
+    Install an :class:`AnnotationsFinder` in front of ``sys.meta_path``
+    and patch the already imported Sage modules.
+
+    Return the finder; calling this function again returns the same
+    finder.
+    """
+    for finder in sys.meta_path:
+        if isinstance(finder, AnnotationsFinder):
+            return finder
+    finder = AnnotationsFinder(packages, log_level=log_level)
+    sys.meta_path.insert(0, finder)
+    finder.patch_imported()
+    return finder
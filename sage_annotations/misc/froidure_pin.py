@@ -0,0 +1,403 @@
+r"""
+Enumeration of finite semigroups with the Froidure-Pin algorithm
+
+Given generators of a finite semigroup (or monoid), :class:`FroidurePin`
+enumerates its elements, indexed by integers in the order of
+discovery, together with its right and left Cayley graphs stored as
+arrays of machine integers, and exposed as NumPy arrays: ``right[i, a]`` (resp. ``left[i, a]``) is the index of
+the product of the ``i``-th element by (resp. of) the ``a``-th
+generator.
+
+Following [FP1997]_, each element is recorded with its reduced word
+through its first and last letters, prefix and suffix; products whose
+value can be deduced from the already computed part of the Cayley
+graphs are not computed, and the left Cayley graph is deduced from
+the right one without any multiplication. The elements themselves are
+only used for multiplying and hashing; the questions answered from the
+Cayley graphs (Green's relations triviality, Cayley graphs) do not
+touch them.
+
+The memory used is about `9k+20` bytes per element for `k`
+generators, on top of the elements themselves; this makes semigroups
+with `10^6` to `10^7` elements feasible.
+
+REFERENCES:
+
+.. [FP1997] \V. Froidure and J.-E. Pin, *Algorithms for computing
+   finite semigroups*. Foundations of computational mathematics
+   (Rio de Janeiro, 1997), 112-126, Springer, Berlin, 1997.
+
+EXAMPLES::
+
+    sage: from sage.misc.froidure_pin import FroidurePin
+    sage: S = FiniteSemigroups().example(alphabet=('a','b','c'))
+    sage: F = FroidurePin(S.semigroup_generators())
+    sage: len(F)
+    15
+    sage: F.right[:3]
+    array([[0, 3, 4],
+           [5, 1, 6],
+           [7, 8, 2]], dtype=int32)
+    sage: F.is_r_trivial(), F.is_l_trivial(), F.is_d_trivial()
+    (True, False, False)
+    sage: F.word(14)
+    (2, 1, 0)
+
+    sage: M = Monoids().Finite().example()    # the monoid of residues modulo 12
+    sage: F = FroidurePin(M.monoid_generators(), one=M.one())
+    sage: len(F), F.element(0)
+    (12, 1)
+"""
+
+import array
+
+def _zeros(k):
+    return array.array("i", bytes(4 * k))
+
+class FroidurePin(object):
+    """
+    The elements and Cayley graphs of the semigroup generated by ``generators``
+
+    INPUT:
+
+    - ``generators`` -- a finite family or iterable of elements of a
+      finite semigroup, which are hashable
+    - ``one`` -- the identity (default: ``None``); if specified, the
+      monoid generated by ``generators`` is enumerated instead, with
+      ``one`` as element ``0``
+
+    The generators are indexed by their positions. Their labels in
+    :meth:`cayley_graph`, stored in :attr:`keys`, are their keys if
+    ``generators`` is a family, and the generators themselves otherwise.
+    """
+    def __init__(self, generators, one=None):
+        try:
+            self.keys = list(generators.keys())
+            generators = [generators[key] for key in self.keys]
+        except AttributeError:
+            generators = list(generators)
+            self.keys = generators
+        self.generators = generators
+        self.one = one
+        self._elements = []
+        self._index = {}
+        # The Cayley graphs, as flat arrays: the product of the i-th
+        # element and the a-th generator is at position i*k+a. They
+        # are stored as compact arrays of machine integers, which are
+        # faster to index from Python than NumPy arrays, and exposed
+        # as NumPy arrays without copy once the enumeration is done
+        self._right = array.array("i")
+        self._left = array.array("i")
+        # Whether right[i, a] was obtained as a new element, i.e. the
+        # reduced word of right[i, a] is the word of i followed by a
+        self._reduced = bytearray()
+        # The first and last letters, the prefix, the suffix and the
+        # length of the reduced word of each element; -1 for none
+        self._first = array.array("i")
+        self._last = array.array("i")
+        self._prefix = array.array("i")
+        self._suffix = array.array("i")
+        self._length = array.array("i")
+        if one is not None:
+            self._add(one, -1, -1, -1, -1, 0)
+        self._generator_index = []
+        for (a, g) in enumerate(generators):
+            i = self._index.get(g)
+            if i is None:
+                i = self._add(g, a, a, -1, -1, 1)
+            self._generator_index.append(i)
+        self._enumerate()
+
+    def _add(self, x, first, last, prefix, suffix, length):
+        n = len(self._elements)
+        k = len(self.generators)
+        self._elements.append(x)
+        self._index[x] = n
+        self._right.extend(_zeros(k))
+        self._left.extend(_zeros(k))
+        self._reduced.extend(bytes(k))
+        self._first.append(first)
+        self._last.append(last)
+        self._prefix.append(prefix)
+        self._suffix.append(suffix)
+        self._length.append(length)
+        return n
+
+    def _enumerate(self):
+        """
+        Run the Froidure-Pin algorithm, one word length at a time.
+        """
+        k = len(self.generators)
+        elements = self._elements
+        index = self._index
+        generators = self.generators
+        generator_index = self._generator_index
+        right = self._right
+        left = self._left
+        reduced = self._reduced
+        first = self._first
+        last = self._last
+        prefix = self._prefix
+        suffix = self._suffix
+        length = self._length
+        start = 0
+        if self.one is not None:
+            for a in range(k):
+                right[a] = left[a] = generator_index[a]
+            start = 1
+        while start < len(elements):
+            end = len(elements)
+            l = length[start]
+            # The right Cayley graph for the elements of length l
+            for i in range(start, end):
+                b = first[i]
+                u = suffix[i]
+                x = elements[i]
+                for a in range(k):
+                    if l > 1 and not reduced[u*k+a]:
+                        # The word of u followed by a is not reduced:
+                        # x * a = b * r where r = u * a has a smaller
+                        # reduced word in shortlex order, so that
+                        # b * r = (b * prefix(r)) * last(r) is known
+                        r = right[u*k+a]
+                        if length[r] == 0:
+                            right[i*k+a] = generator_index[b]
+                        elif length[r] == 1:
+                            right[i*k+a] = right[generator_index[b]*k+last[r]]
+                        else:
+                            right[i*k+a] = right[left[prefix[r]*k+b]*k+last[r]]
+                        continue
+                    y = x * generators[a]
+                    j = index.get(y)
+                    if j is None:
+                        j = self._add(y, b, a, i, generator_index[a] if l == 1 else right[u*k+a], l + 1)
+                        reduced[i*k+a] = 1
+                    right[i*k+a] = j
+            # The left Cayley graph for the elements of length l:
+            # a * x = (a * prefix(x)) * last(x)
+            for i in range(start, end):
+                c = last[i]
+                if l == 1:
+                    for a in range(k):
+                        left[i*k+a] = right[generator_index[a]*k+c]
+                else:
+                    p = prefix[i]
+                    for a in range(k):
+                        left[i*k+a] = right[left[p*k+a]*k+c]
+            start = end
+
+    def __len__(self):
+        return len(self._elements)
+
+    def __repr__(self):
+        return "Froidure-Pin enumeration of a {} with {} elements and {} generators".format(
+            "semigroup" if self.one is None else "monoid", len(self._elements), len(self.generators))
+
+    def _array(self, graph):
+        import numpy
+        return numpy.frombuffer(graph, dtype=numpy.intc).reshape(len(self._elements), len(self.generators))
+
+    @property
+    def right(self):
+        """
+        The right Cayley graph, as a NumPy array of shape `(n, k)`.
+        """
+        return self._array(self._right)
+
+    @property
+    def left(self):
+        """
+        The left Cayley graph, as a NumPy array of shape `(n, k)`.
+        """
+        return self._array(self._left)
+
+    def element(self, i):
+        """
+        Return the ``i``-th element.
+        """
+        return self._elements[i]
+
+    def elements(self):
+        """
+        Return the list of the elements, in order of enumeration.
+        """
+        return list(self._elements)
+
+    def index(self, x):
+        """
+        Return the index of the element ``x``.
+        """
+        return self._index[x]
+
+    def word(self, i):
+        """
+        Return the reduced word of the ``i``-th element, as a tuple of
+        indices of generators.
+        """
+        word = []
+        while i >= 0 and self._length[i] > 0:
+            word.append(int(self._last[i]))
+            i = self._prefix[i]
+        return tuple(reversed(word))
+
+    def product(self, i, j):
+        """
+        Return the index of the product of the ``i``-th and ``j``-th elements.
+
+        This follows the word of the ``j``-th element in the right
+        Cayley graph, without multiplying elements.
+        """
+        k = len(self.generators)
+        for a in self.word(j):
+            i = self._right[i*k+a]
+        return i
+
+    def strongly_connected_components(self, side="right"):
+        """
+        Return the number of strongly connected components of the
+        Cayley graph on ``side``, and the component of each element.
+
+        INPUT:
+
+        - ``side`` -- ``"right"`` or ``"left"``
+
+        Uses SciPy if available, and otherwise Tarjan's algorithm.
+        """
+        graph = self.right if side == "right" else self.left
+        try:
+            from scipy.sparse import csr_matrix
+            from scipy.sparse.csgraph import connected_components
+        except ImportError:
+            return _tarjan(graph)
+        import numpy
+        (n, k) = graph.shape
+        adjacency = csr_matrix((numpy.ones(n * k, dtype=numpy.int8),
+                                graph.ravel(),
+                                numpy.arange(0, n * k + 1, k)),
+                               shape=(n, n))
+        return connected_components(adjacency, directed=True, connection="strong")
+
+    def is_r_trivial(self):
+        """
+        Return whether the semigroup is `R`-trivial.
+
+        The `R`-classes are the strongly connected components of the
+        right Cayley graph.
+        """
+        return self.strongly_connected_components("right")[0] == len(self)
+
+    def is_l_trivial(self):
+        """
+        Return whether the semigroup is `L`-trivial.
+        """
+        return self.strongly_connected_components("left")[0] == len(self)
+
+    def is_d_trivial(self):
+        """
+        Return whether the semigroup is `D`-trivial.
+
+        A finite semigroup is `D`-trivial if and only if it is `L`-
+        and `R`-trivial.
+        """
+        return self.is_r_trivial() and self.is_l_trivial()
+
+    def cayley_graph(self, side="right", simple=False):
+        """
+        Return the Cayley graph on ``side``, as a digraph on the elements.
+
+        INPUT:
+
+        - ``side`` -- ``"left"``, ``"right"`` or ``"twosided"``
+        - ``simple`` -- a boolean (default: ``False``): whether to
+          forget the loops, the multiple edges and the labels
+
+        The edges are labelled by the keys of the generators (see
+        :attr:`keys`), and for the two sided graph by pairs ``(key,
+        side)``, as in :meth:`Semigroups.ParentMethods.cayley_graph`.
+
+        EXAMPLES::
+
+            sage: from sage.misc.froidure_pin import FroidurePin
+            sage: S = FiniteSemigroups().example(alphabet=('a','b'))
+            sage: g = FroidurePin(S.semigroup_generators()).cayley_graph(simple=True)
+            sage: g == S.cayley_graph(simple=True)
+            True
+        """
+        from sage.graphs.digraph import DiGraph
+        if side not in ("left", "right", "twosided"):
+            raise ValueError("option 'side' must be 'left', 'right' or 'twosided'")
+        elements = self._elements
+        sides = ["left", "right"] if side == "twosided" else [side]
+        edges = []
+        pairs = set()
+        for s in sides:
+            graph = self.right if s == "right" else self.left
+            for (a, key) in enumerate(self.keys):
+                if simple:
+                    pairs.update((i, j) for (i, j) in enumerate(graph[:, a].tolist()) if i != j)
+                else:
+                    label = (key, s) if side == "twosided" else key
+                    edges.extend((elements[i], elements[j], label)
+                                 for (i, j) in enumerate(graph[:, a].tolist()))
+        if simple:
+            edges = [(elements[i], elements[j], None) for (i, j) in sorted(pairs)]
+        return DiGraph([elements, edges], format="vertices_and_edges",
+                       loops=not simple, multiedges=not simple)
+
+def _tarjan(graph):
+    """
+    Return the number of strongly connected components of the graph
+    given by its array of successors, and the component of each vertex.
+
+    This is an iterative version of Tarjan's algorithm.
+
+    EXAMPLES::
+
+        sage: import numpy
+        sage: from sage.misc.froidure_pin import _tarjan
+        sage: _tarjan(numpy.array([[1], [0], [0]]))
+        (2, array([0, 0, 1]))
+    """
+    import numpy
+    (n, k) = graph.shape
+    successors = graph.tolist()
+    index = [-1] * n
+    lowlink = [0] * n
+    on_stack = [False] * n
+    stack = []
+    labels = numpy.empty(n, dtype=numpy.int32)
+    counter = 0
+    components = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        while work:
+            (v, a) = work.pop()
+            if a == 0:
+                index[v] = lowlink[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack[v] = True
+            else:
+                w = successors[v][a - 1]
+                lowlink[v] = min(lowlink[v], lowlink[w])
+            while a < k:
+                w = successors[v][a]
+                a += 1
+                if index[w] == -1:
+                    work.append((v, a))
+                    work.append((w, 0))
+                    break
+                elif on_stack[w]:
+                    lowlink[v] = min(lowlink[v], index[w])
+            else:
+                if lowlink[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        labels[w] = components
+                        if w == v:
+                            break
+                    components += 1
+    return (components, labels)
@@ -0,0 +1,145 @@
+r"""
+Lazily computed series of Lie subalgebras
+
+A :class:`LieSeries` computes the terms of a series of subalgebras of
+a GAP Lie algebra one at a time, each from the previous one, and
+remembers them. The series ends just before the first term with the
+same dimension as the previous one, which is the convention of GAP's
+``LieDerivedSeries``, ``LieLowerCentralSeries`` and
+``LieUpperCentralSeries``.
+
+The steps of these three series are :func:`derived_step`,
+:func:`lower_central_step` and :func:`upper_central_step`.
+
+EXAMPLES::
+
+    sage: from sage.libs.gap.libgap import libgap
+    sage: from sage.misc.lie_series import LieSeries, derived_step
+    sage: L = libgap.LieAlgebra(libgap.Rationals, [[[1, 0], [0, 0]], [[0, 1], [0, 0]]])
+    sage: S = LieSeries(L, derived_step)
+    sage: S[1]
+    <Lie algebra of dimension 1 over Rationals>
+    sage: S.dimensions()
+    [2, 1]
+    sage: list(S)
+    [<Lie algebra of dimension 2 over Rationals>,
+     <Lie algebra of dimension 1 over Rationals>,
+     <Lie algebra of dimension 0 over Rationals>]
+    sage: S.dimensions()
+    [2, 1, 0]
+    sage: S.last()
+    <Lie algebra of dimension 0 over Rationals>
+"""
+
+def _subalgebra(L, U):
+    """
+    Return the subspace ``U`` of the GAP Lie algebra ``L`` as a subalgebra.
+    """
+    from sage.libs.gap.libgap import libgap
+    return libgap.SubalgebraNC(L, libgap.BasisVectors(libgap.Basis(U)), "basis")
+
+def derived_step(L, U):
+    """
+    Return `[U, U]`, as a subalgebra of ``L``.
+    """
+    from sage.libs.gap.libgap import libgap
+    return _subalgebra(L, libgap.ProductSpace(U, U))
+
+def lower_central_step(L, U):
+    """
+    Return `[L, U]`, as a subalgebra of ``L``.
+    """
+    from sage.libs.gap.libgap import libgap
+    return _subalgebra(L, libgap.ProductSpace(L, U))
+
+def upper_central_step(L, U):
+    """
+    Return the preimage in ``L`` of the center of `L/U`.
+    """
+    from sage.libs.gap.libgap import libgap
+    if libgap.Dimension(U) == 0:
+        return _subalgebra(L, libgap.LieCentre(L))
+    quotient = libgap.NaturalHomomorphismByIdeal(L, U)
+    return _subalgebra(L, libgap.PreImagesSet(quotient, libgap.LieCentre(libgap.Range(quotient))))
+
+class LieSeries(object):
+    """
+    A series of subalgebras of a GAP Lie algebra, computed on demand
+
+    INPUT:
+
+    - ``L`` -- a GAP Lie algebra
+    - ``step`` -- a function ``(L, U) -> V`` computing the term
+      following ``U``
+    - ``first`` -- the first term (default: ``L``)
+    - ``wrap`` -- a function applied to the terms when they are
+      returned (default: the identity)
+    """
+    def __init__(self, L, step, first=None, wrap=None):
+        from sage.libs.gap.libgap import libgap
+        if first is None:
+            first = L
+        self.L = L
+        self.step = step
+        self.wrap = wrap
+        self._terms = [first]
+        self._dimensions = [int(libgap.Dimension(first))]
+        self._complete = False
+
+    def _extend(self):
+        """
+        Compute the next term; return whether there is one.
+        """
+        from sage.libs.gap.libgap import libgap
+        if self._complete:
+            return False
+        term = self.step(self.L, self._terms[-1])
+        dimension = int(libgap.Dimension(term))
+        if dimension == self._dimensions[-1]:
+            self._complete = True
+            return False
+        self._terms.append(term)
+        self._dimensions.append(dimension)
+        if dimension == 0:
+            self._complete = True
+        return True
+
+    def _result(self, term):
+        return term if self.wrap is None else self.wrap(term)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        while i >= len(self._terms) and self._extend():
+            pass
+        return self._result(self._terms[i])
+
+    def __iter__(self):
+        i = 0
+        while i < len(self._terms) or self._extend():
+            yield self._result(self._terms[i])
+            i += 1
+
+    def __len__(self):
+        while self._extend():
+            pass
+        return len(self._terms)
+
+    def dimensions(self):
+        """
+        Return the dimensions of the terms computed so far.
+        """
+        return list(self._dimensions)
+
+    def last(self):
+        """
+        Return the last term of the series, computing all the terms.
+        """
+        return self[len(self) - 1]
+
+    def last_dimension(self):
+        """
+        Return the dimension of the last term of the series.
+        """
+        len(self)
+        return self._dimensions[-1]
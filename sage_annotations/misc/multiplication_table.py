@@ -0,0 +1,209 @@
+r"""
+Memory-mapped multiplication tables of finite semigroups
+
+:class:`MultiplicationTable` stores the multiplication table of a
+finite semigroup, as enumerated by
+:class:`~sage.misc.froidure_pin.FroidurePin`, as a square array of
+element indices in a NumPy ``.npy`` file, accessed through a memory
+map: ``table[i, j]`` is the index of the product of the ``i``-th and
+``j``-th elements. Only the pages actually accessed are loaded, so
+that the table may exceed the available memory.
+
+The table is computed without multiplying elements, one row at a
+time: if the reduced word of the ``i``-th element is `b u`, its row
+is the row of `u` mapped through the left Cayley graph by `b`. Rows
+are written in blocks of bounded size; the number of rows written so
+far is recorded in a sidecar file, so that an interrupted computation
+resumes where it stopped.
+
+The files are named after a digest of the Cayley graphs and reduced
+words the table is computed from, so that the table of a semigroup is
+reused across sessions, and that of a different semigroup is never
+picked up by mistake.
+
+EXAMPLES::
+
+    sage: import tempfile
+    sage: from sage.misc.froidure_pin import FroidurePin
+    sage: from sage.misc.multiplication_table import MultiplicationTable
+    sage: S = FiniteSemigroups().example(alphabet=('a','b','c'))
+    sage: F = FroidurePin(S.semigroup_generators())
+    sage: directory = tempfile.mkdtemp()
+    sage: T = MultiplicationTable(F, directory=directory); T
+    Multiplication table of a semigroup with 15 elements
+    sage: T[1, 2], F.product(1, 2)
+    (6, 6)
+    sage: T.row(0)
+    memmap([ 0,  3,  4,  3,  4,  3,  9,  4, 10,  9, 10,  9,  9, 10, 10],
+           dtype=uint8)
+    sage: T.product(S('a'), S('cb'))
+    'acb'
+
+The second time, the table is read back from the disk::
+
+    sage: T.filename == MultiplicationTable(F, directory=directory).filename
+    True
+"""
+
+import hashlib
+import json
+import numbers
+import os
+
+# The default memory budget, in bytes, for a block of rows
+block_budget = 1 << 26
+
+def default_directory():
+    """
+    Return the default directory for the multiplication tables.
+    """
+    from sage.env import DOT_SAGE
+    return os.path.join(DOT_SAGE, "multiplication_tables")
+
+class MultiplicationTable(object):
+    """
+    The multiplication table of a finite semigroup, stored in a memory-mapped file
+
+    INPUT:
+
+    - ``engine`` -- a :class:`~sage.misc.froidure_pin.FroidurePin`
+    - ``directory`` -- a directory name (default: the subdirectory
+      ``multiplication_tables`` of ``DOT_SAGE``)
+    - ``block_size`` -- the number of rows computed between two
+      writes to the disk (default: as many as fit in
+      :data:`block_budget` bytes)
+
+    The entries are stored with the smallest unsigned integer type
+    holding the indices of the elements.
+    """
+    def __init__(self, engine, directory=None, block_size=None):
+        import numpy
+        self.engine = engine
+        n = len(engine)
+        self.dtype = numpy.min_scalar_type(max(n - 1, 0))
+        if block_size is None:
+            block_size = max(1, block_budget // max(1, n * self.dtype.itemsize))
+        self.block_size = block_size
+        if directory is None:
+            directory = default_directory()
+        os.makedirs(directory, exist_ok=True)
+        self.key = self._digest()
+        self.filename = os.path.join(directory, self.key + ".npy")
+        self._progress = os.path.join(directory, self.key + ".json")
+        self._build()
+        self._table = numpy.load(self.filename, mmap_mode="r")
+
+    def _digest(self):
+        """
+        Return a digest of the data the table is computed from.
+        """
+        engine = self.engine
+        digest = hashlib.sha256()
+        digest.update("{} {} {}".format(len(engine), len(engine.generators), self.dtype.str).encode())
+        for data in (engine._left, engine._first, engine._suffix, engine._length):
+            digest.update(data.tobytes())
+        return digest.hexdigest()
+
+    def _rows_done(self):
+        """
+        Return the number of rows already written to the file.
+        """
+        if not os.path.exists(self.filename):
+            return None
+        try:
+            with open(self._progress) as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if progress.get("key") != self.key:
+            return None
+        return progress["rows"]
+
+    def _write_progress(self, rows):
+        # Replaced atomically, so that it never claims unwritten rows
+        filename = self._progress + ".tmp"
+        with open(filename, "w") as f:
+            json.dump({"key": self.key, "rows": rows}, f)
+        os.replace(filename, self._progress)
+
+    def _build(self):
+        """
+        Compute the rows of the table not yet written to the file.
+        """
+        import numpy
+        engine = self.engine
+        n = len(engine)
+        start = self._rows_done()
+        if start == n:
+            return
+        if start is None:
+            start = 0
+            table = numpy.lib.format.open_memmap(self.filename, mode="w+", dtype=self.dtype, shape=(n, n))
+            self._write_progress(0)
+        else:
+            table = numpy.lib.format.open_memmap(self.filename, mode="r+")
+        left = engine.left.astype(self.dtype).T.copy()
+        first = engine._first
+        suffix = engine._suffix
+        length = engine._length
+        for r0 in range(start, n, self.block_size):
+            r1 = min(n, r0 + self.block_size)
+            block = numpy.empty((r1 - r0, n), dtype=self.dtype)
+            for i in range(r0, r1):
+                if length[i] == 0:
+                    block[i - r0] = numpy.arange(n, dtype=self.dtype)
+                elif length[i] == 1:
+                    block[i - r0] = left[first[i]]
+                else:
+                    # The i-th element is b u: its product with the
+                    # j-th element is b times the product of u with it
+                    s = suffix[i]
+                    row = block[s - r0] if s >= r0 else table[s]
+                    numpy.take(left[first[i]], row, out=block[i - r0])
+            table[r0:r1] = block
+            table.flush()
+            self._write_progress(r1)
+        del table
+
+    def __repr__(self):
+        return "Multiplication table of a {} with {} elements".format(
+            "semigroup" if self.engine.one is None else "monoid", len(self.engine))
+
+    def __len__(self):
+        return len(self.engine)
+
+    def __getitem__(self, key):
+        """
+        Return ``self[i, j]``, the index of the product of the
+        ``i``-th and ``j``-th elements, or the corresponding slice of
+        the memory map.
+        """
+        result = self._table[key]
+        if isinstance(key, tuple) and all(isinstance(i, numbers.Integral) for i in key):
+            return int(result)
+        return result
+
+    def row(self, i):
+        """
+        Return the indices of the products of the ``i``-th element with all the elements.
+
+        This is a view on the memory map, which reads a contiguous
+        part of the file.
+        """
+        return self._table[i]
+
+    def column(self, j):
+        """
+        Return the indices of the products of all the elements with the ``j``-th element.
+
+        This is a view on the memory map; accessing it reads one
+        entry in each row of the file.
+        """
+        return self._table[:, j]
+
+    def product(self, x, y):
+        """
+        Return the product of the elements ``x`` and ``y``, as read from the table.
+        """
+        engine = self.engine
+        return engine.element(int(self._table[engine.index(x), engine.index(y)]))
@@ -15,7 +15,9 @@ EXAMPLES::
     sage: Family[Iterator[Set[List[Self]]]]
     sage.misc.sage_typing.Family[typing.Iterator[typing.Set[typing.List[Self]]]]
 """
+import collections.abc
 import itertools
+import sys
 
 import inspect
 import typing
@@ -28,20 +30,56 @@ Any, List, Set, Iterator
 from sage.misc.abstract_method import AbstractMethod
 from sage.misc.call import attrcall
 from sage.categories.category import Category
-from sage.libs.gap.libgap import libgap
 import sage.sets.family
 
+# The name of the attribute of a value where its specializations are cached
+_specializations = "_sage_typing_specializations"
+
 def specialize(type, value):
     """
-    Return a callable type that takes a GAP handle and make
+    Return the specialization of ``type`` for ``value``.
+
+    The specialization is cached in the dictionary of ``value``, if
+    any; this way it does not prevent ``value`` from being garbage
+    collected, unlike a global cache (even with weak keys) since the
+    specialized types typically refer to ``value``.
+
+    EXAMPLES::
+
+        sage: from sage.misc.sage_typing import specialize, Facade, List, Self
+        sage: P = Sets().example()
+        sage: specialize(Self, P) is P
+        True
+        sage: T = specialize(Facade[Facade[Self]], P); T
+        sage.misc.sage_typing.Facade[sage.misc.sage_typing.Facade[Set of prime numbers (basic implementation)]]
+        sage: specialize(Facade[Facade[Self]], P) is T
+        True
+        sage: specialize(List[int], P) is List[int]
+        True
     """
-    if hasattr(type, "specialize"):
-        return type.specialize(value)
-    else:
+    if not hasattr(type, "specialize"):
         return type
+    try:
+        cache = value.__dict__[_specializations]
+    except KeyError:
+        cache = {}
+        try:
+            value.__dict__[_specializations] = cache
+        except TypeError: # e.g. value is a class
+            return type.specialize(value)
+    except AttributeError: # value has no __dict__
+        return type.specialize(value)
+    try:
+        return cache[type]
+    except KeyError:
+        result = cache[type] = type.specialize(value)
+        return result
 
 def GenericMeta_specialize(self, value):
-    return self.copy_with(tuple(specialize(a, value) for a in self.__args__))
+    args = tuple(specialize(a, value) for a in self.__args__)
+    if all(a is b for (a, b) in zip(args, self.__args__)):
+        return self
+    return self.copy_with(args)
 _GenericAlias.specialize = GenericMeta_specialize
 
 Family = _GenericAlias(sage.sets.family.TrivialFamily, typing.T)
@@ -66,11 +104,178 @@ class DependentType:#(typing._TypingBase): # Singleton
         return self.name
     def __call__(self, o):
         pass
+    # Dependent types are compared by value, so that they, and the
+    # types built from them, can be used as keys of caches
+    def __eq__(self, other):
+        return (isinstance(other, DependentType) and
+                self.name == other.name and self.specialize == other.specialize)
+    def __ne__(self, other):
+        return not self == other
+    def __hash__(self):
+        return hash(self.name)
+    def __reduce__(self):
+        # Pickle the dependent types defined in this module by name
+        return self.name
 
 Self         = DependentType(lambda x: x,            name="Self")
 FacadeFor    = DependentType(attrcall("facade_for"), name="FacadeFor")
 ParentOfSelf = DependentType(attrcall("parent"    ), name="ParentOfSelf")
 
+def type_repr(t):
+    """
+    Return a canonical string representation of the type ``t``
+
+    Unlike :func:`repr`, this does not depend on the modules the
+    types are defined in, nor on the version of :mod:`typing`.
+
+    EXAMPLES::
+
+        sage: from sage.misc.sage_typing import type_repr, Facade, Family, List, Sage, Self
+        sage: type_repr(Facade[Facade[Self]])
+        'Facade[Facade[Self]]'
+        sage: type_repr(Family[Self]), type_repr(List), type_repr(Sage), type_repr(bool)
+        ('Family[Self]', 'List', 'Sage', 'bool')
+    """
+    for name in ["Self", "FacadeFor", "ParentOfSelf", "Sage", "Family", "Facade"]:
+        if t is globals()[name]:
+            return name
+    if isinstance(t, DependentType):
+        return t.name
+    if isinstance(t, (type, typing.TypeVar)):
+        return t.__name__
+    origin = getattr(t, "__origin__", None)
+    if origin is None:
+        return repr(t)
+    if origin is sage.sets.family.TrivialFamily:
+        name = "Family"
+    elif origin is _Facade:
+        name = "Facade"
+    else:
+        name = getattr(t, "_name", None) or getattr(origin, "__name__", repr(origin))
+    args = getattr(t, "__args__", ())
+    if all(isinstance(arg, typing.TypeVar) for arg in args):
+        return name
+    return "{}[{}]".format(name, ", ".join(type_repr(arg) for arg in args))
+
+_absent = object()
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+class MethodSemantic(collections.abc.Mapping):
+    """
+    The semantic information of a method, as an immutable mapping
+
+    The common entries ``gap``, ``mmt``, ``codomain`` and ``cost``
+    are stored in slots, and the others in a dictionary; strings are
+    interned. A record is shared by all the categories inheriting the
+    method (see :meth:`~sage.categories.category.Category.collect_semantic`).
+
+    The entries ``argspec`` and ``arity`` are computed from the
+    method on first access and then cached: extracting the argspec
+    may require parsing the source, which is too costly to be done
+    for every annotated method upon importing the annotations.
+
+    EXAMPLES::
+
+        sage: from sage.misc.sage_typing import MethodSemantic
+        sage: def zero(self):
+        ....:     pass
+        sage: s = MethodSemantic(zero, {'gap': 'Zero'})
+        sage: s['gap']
+        'Zero'
+        sage: 'arity' in s
+        True
+        sage: s['arity']
+        1
+        sage: s
+        {'argspec': ArgSpec(args=['self'], varargs=None, keywords=None, defaults=None), 'arity': 1, 'gap': 'Zero'}
+        sage: s['gap'] = 'One'
+        Traceback (most recent call last):
+        ...
+        TypeError: 'MethodSemantic' object does not support item assignment
+
+    For code expecting a dictionary::
+
+        sage: type(s.as_dict())
+        <... 'dict'>
+    """
+    __slots__ = ("gap", "mmt", "codomain", "cost", "_extra", "_function", "_argspec")
+    _fields = ("gap", "mmt", "codomain", "cost")
+    _lazy_keys = ("argspec", "arity")
+
+    def __init__(self, f, options):
+        set = object.__setattr__
+        extra = {}
+        for (key, value) in options.items():
+            if key in self._fields:
+                set(self, key, _intern(value))
+            else:
+                extra[sys.intern(key)] = _intern(value)
+        set(self, "_extra", extra or None)
+        set(self, "_function", f)
+        set(self, "_argspec", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+    def _compute_argspec(self):
+        if self._argspec is None:
+            f = self._function
+            if isinstance(f, AbstractMethod):
+                f = f._f
+            object.__setattr__(self, "_argspec", sage.misc.sageinspect.sage_getargspec(f))
+        return self._argspec
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            value = getattr(self, key, _absent)
+            if value is not _absent:
+                return value
+        elif key in self._lazy_keys:
+            if self._function is not None:
+                argspec = self._compute_argspec()
+                return argspec if key == "argspec" else len(argspec.args)
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self._fields:
+            return hasattr(self, key)
+        if key in self._lazy_keys:
+            return self._function is not None
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key in self._fields:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+        if self._function is not None:
+            yield from self._lazy_keys
+
+    def __len__(self):
+        return (sum(1 for key in self._fields if hasattr(self, key)) +
+                len(self._extra or ()) +
+                (len(self._lazy_keys) if self._function is not None else 0))
+
+    def as_dict(self):
+        """
+        Return the semantic information as a new dictionary.
+        """
+        return dict(self.items())
+
+    copy = as_dict
+
+    def __repr__(self):
+        # Sorted, as Sage displays dictionaries
+        return "{" + ", ".join("{!r}: {!r}".format(key, self[key]) for key in sorted(self)) + "}"
+
+    def __reduce__(self):
+        return (dict, (self.as_dict(),))
+
 class WrapMethod:
     """
 
@@ -78,26 +283,36 @@ class WrapMethod:
 
     EXAMPLES::
 
-        sage: from sage.misc.sage_typing import WrapMethod
+        sage: from sage.misc.sage_typing import WrapMethod, Self
         sage: def zero(self):
         ....:     pass
         sage: f = WrapMethod(zero, gap_name="Zero")
         sage: f.semantic
-        {'argspec': ArgSpec(args=['self'], varargs=None, keywords=None, defaults=None),
-        'arity': 1,
-        'gap_name': 'Zero'}
-        sage: c = f.generate_code("NeutralElement") # not tested
-        sage: c                                     # not tested
+        {'argspec': ArgSpec(args=['self'], varargs=None, keywords=None, defaults=None), 'arity': 1, 'gap_name': 'Zero'}
+        sage: f = WrapMethod(zero, gap="Zero", codomain=Self)
+        sage: c = f.generate_code()
+        sage: c
         <function zero at ...>
+        sage: print(c.__source__)
+        def zero(self):
+            if _hooks.active:
+                return _hooks.record(_key, self, lambda: F(self.gap()), _convert, _codomain)
+            x = F(self.gap())
+            return self(x)
     """
     def __init__(self, f, **options):
         self.__imfunc__= f
-        self.semantic = dict(options)
-        if isinstance(f, AbstractMethod):
-            f = f._f
-        argspec = sage.misc.sageinspect.sage_getargspec(f)
-        self.semantic['argspec']= argspec
-        self.semantic['arity'] = len(argspec.args)
+        self.semantic = MethodSemantic(f, options)
+
+    def generate_code(self, gap_name=None, context="parent"):
+        """
+        Return a GAP backed implementation of this method.
+
+        See :func:`sage.misc.semantic_codegen.generate_method`.
+        """
+        from sage.misc.semantic_codegen import generate_method
+        return generate_method(self.__imfunc__.__name__, self.semantic,
+                               context=context, gap_name=gap_name)
 
 
 nested_classes_of_categories = [
@@ -107,11 +322,208 @@ nested_classes_of_categories = [
     "SubcategoryMethods",
 ]
 
-annotated_categories = []
+class CategoryRegistry(object):
+    """
+    The registry of the annotated categories
+
+    The categories are stored in registration order, each once,
+    together with the name of the module holding their annotations.
+    Membership tests are dictionary lookups.
+
+    Callbacks can :meth:`subscribe` to the changes; they are called as
+    ``callback(event, cls)`` where ``event`` is ``"registered"`` (a
+    new category), ``"updated"`` (a category registered again, e.g.
+    when its annotations are reloaded) or ``"unregistered"``. Caches
+    derived from the annotations (e.g. that of
+    :meth:`~sage.categories.category.Category.collect_semantic`) use
+    this to invalidate their entries.
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from sage.misc.sage_typing import annotated_categories
+        sage: from sage.categories.semigroups import Semigroups
+        sage: Semigroups in annotated_categories
+        True
+        sage: annotated_categories.module(Semigroups)
+        'sage_annotations.categories.semigroups'
+        sage: events = []
+        sage: def callback(event, cls):
+        ....:     events.append((event, cls.__name__))
+        sage: annotated_categories.subscribe(callback)
+        sage: n = len(annotated_categories)
+        sage: annotated_categories.register(Semigroups)
+        sage: len(annotated_categories) == n
+        True
+        sage: events
+        [('updated', 'Semigroups')]
+        sage: annotated_categories.unsubscribe(callback)
+    """
+    def __init__(self):
+        # category class -> name of its annotation module
+        self._modules = {}
+        # class holding the annotations -> category class
+        self._targets = {}
+        self._subscribers = []
+        # Incremented on each change
+        self.generation = 0
+
+    def __contains__(self, cls):
+        return cls in self._modules
+
+    def __iter__(self):
+        return iter(list(self._modules))
+
+    def __len__(self):
+        return len(self._modules)
+
+    def module(self, cls):
+        """
+        Return the name of the module holding the annotations of ``cls``.
+        """
+        return self._modules[cls]
+
+    def target(self, source):
+        """
+        Return the category class into which the annotations held by
+        the class ``source`` were monkey patched.
+
+        Raise a ``KeyError`` if no category was registered with these
+        annotations.
+        """
+        return self._targets[source]
+
+    def subscribe(self, callback):
+        """
+        Call ``callback(event, cls)`` on each change.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def _notify(self, event, cls):
+        self.generation += 1
+        for callback in list(self._subscribers):
+            callback(event, cls)
+
+    def register(self, cls, source=None):
+        """
+        Register the annotated category class ``cls``.
+
+        INPUT:
+
+        - ``cls`` -- a category class
+        - ``source`` -- the class holding the annotations, if they were
+          monkey patched into ``cls`` (default: ``cls``)
+        """
+        assert issubclass(cls, Category)
+        event = "updated" if cls in self._modules else "registered"
+        if source is None:
+            source = cls
+        self._modules[cls] = source.__module__
+        self._targets[source] = cls
+        self._notify(event, cls)
+
+    def unregister(self, cls):
+        """
+        Unregister the annotated category class ``cls``.
+        """
+        del self._modules[cls]
+        for (source, target) in list(self._targets.items()):
+            if target is cls:
+                del self._targets[source]
+        self._notify("unregistered", cls)
+
+    def reload(self, module):
+        """
+        Reload the annotation module ``module``, and monkey patch it again.
+
+        INPUT:
+
+        - ``module`` -- the name of an annotation module, e.g.
+          ``"sage_annotations.categories.semigroups"``
+
+        The categories it annotates are unregistered, and registered
+        again (with the new annotations) when the module is reloaded.
+
+        OUTPUT: the reloaded module
+        """
+        import importlib
+        from recursive_monkey_patch import monkey_patch
+        for cls in self:
+            if self._modules[cls] == module:
+                self.unregister(cls)
+        source = importlib.reload(sys.modules[module])
+        target = module.replace("sage_annotations.", "sage.", 1)
+        if target != module:
+            monkey_patch(source, importlib.import_module(target))
+        return source
+
+annotated_categories = CategoryRegistry()
 
 def register_annotated_category(cls, source=None):
-    assert issubclass(cls, Category)
-    annotated_categories.append(cls)
+    annotated_categories.register(cls, source)
+
+def annotated_methods(categories=None):
+    """
+    Iterate through the annotated methods of the annotated categories
+
+    INPUT:
+
+    - ``categories`` -- an iterable of category classes (default: all
+      annotated categories)
+
+    OUTPUT: tuples ``(cls, nested_class_name, method_name, semantic)``
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from sage.misc.sage_typing import annotated_methods
+        sage: from sage.categories.semigroups import Semigroups
+        sage: [(nested, name, semantic['gap'])
+        ....:  for (cls, nested, name, semantic) in annotated_methods([Semigroups])
+        ....:  if name.startswith("is_")]
+        [('ParentMethods', 'is_l_trivial', 'IsLTrivial'),
+         ('ParentMethods', 'is_r_trivial', 'IsRTrivial'),
+         ('ParentMethods', 'is_d_trivial', 'IsDTrivial')]
+    """
+    if categories is None:
+        categories = annotated_categories
+    for cls in categories:
+        for nested_class_name in nested_classes_of_categories:
+            nested_class = cls.__dict__.get(nested_class_name)
+            if nested_class is None:
+                continue
+            for (name, semantic) in nested_class.__dict__.get("_semantic", {}).items():
+                yield (cls, nested_class_name, name, semantic)
+
+def wrap_implementation(f, name, semantic, category):
+    """
+    Return the concrete implementation ``f`` of an annotated method,
+    wrapped according to its annotations.
+
+    INPUT:
+
+    - ``f`` -- a function
+    - ``name`` -- the name of the method
+    - ``semantic`` -- the annotations of the method
+    - ``category`` -- the class holding the annotations
+
+    Implementations of methods with a GAP alignment are recorded by
+    the instrumentation (see :mod:`sage.misc.semantic_hooks`), and
+    the results of those annotated with ``cost="expensive"`` are
+    cached (see :mod:`sage.misc.semantic_cache`), the calls answered
+    from the cache not being recorded. Other implementations are
+    returned as is.
+    """
+    if semantic.get("gap") is not None:
+        from sage.misc.semantic_hooks import instrumented_method
+        f = instrumented_method(f, name, category, semantic.get("codomain"))
+    if semantic.get("cost") == "expensive":
+        from sage.misc.semantic_cache import cached_semantic_method
+        f = cached_semantic_method(f, name)
+    return f
 
 def harvest_class(cls, **options):
     """
@@ -144,10 +556,30 @@ def harvest_class(cls, **options):
                 continue
             if isinstance(method, WrapMethod):
                 nested_class_semantic[key] = method.semantic
-                setattr(source, key, method.__imfunc__)
+                f = method.__imfunc__
+                if not isinstance(f, AbstractMethod):
+                    f = wrap_implementation(f, key, method.semantic, cls)
+                setattr(source, key, f)
         source._semantic = nested_class_semantic
 
+    # Generate the methods of the GAP axiom category, if any
+    if "GAP" in cls.__dict__:
+        from sage.misc.semantic_codegen import populate_gap_category
+        populate_gap_category(cls)
+
 def semantic(**options):
+    """
+    Decorator adding semantic annotations to a category class or a method
+
+    For a category, see :func:`harvest_class`. For a method, the
+    typical options are:
+
+    - ``gap``, ``mmt`` -- the name of the method in GAP and MMT
+    - ``codomain`` -- the type of the result
+    - ``cost`` -- ``"expensive"`` for methods whose results are
+      worth caching (see :mod:`sage.misc.semantic_cache`); by default
+      methods are assumed to be cheap
+    """
     def f(cls_or_function):
         if inspect.isclass(cls_or_function):
             cls = cls_or_function
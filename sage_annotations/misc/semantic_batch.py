@@ -0,0 +1,110 @@
+r"""
+Batched calls of annotated methods on many GAP backed parents
+
+Calling ``P.cardinality()`` on each of many GAP backed parents costs
+one round trip to GAP and one conversion per parent. Instead,
+:func:`batch_call` looks up the GAP alignment of the method in the
+annotations, computes all the results with a single call
+``List(objs, f)`` in GAP, and converts the results in bulk according
+to the annotated codomain.
+
+EXAMPLES::
+
+    sage: import sage_annotations
+    sage: from mygap import mygap
+    sage: from sage.misc.semantic_batch import batch_call
+    sage: groups = [mygap.SymmetricGroup(n) for n in range(1, 6)]
+    sage: batch_call(groups, "cardinality")
+    [1, 2, 6, 24, 120]
+    sage: batch_call(groups, "is_abelian")
+    [True, True, False, False, False]
+"""
+
+import time
+
+# A GAP function applying f, with extra arguments, to all objects
+_list_with_arguments = []
+
+def _gap_list(objs, f, args):
+    """
+    Return the GAP list ``List(objs, x -> f(x, args...))``.
+    """
+    from sage.libs.gap.libgap import libgap
+    if not args:
+        return libgap.List(objs, f)
+    if not _list_with_arguments:
+        _list_with_arguments.append(libgap.eval(
+            "function(objs, f, args) "
+            "return List(objs, x -> CallFuncList(f, Concatenation([x], args))); end"))
+    return _list_with_arguments[0](objs, f, [a.gap() if hasattr(a, "gap") else a for a in args])
+
+def gap_semantic(category, name):
+    """
+    Return the semantic of the parent method ``name`` for ``category``.
+
+    Raise a ``ValueError`` if this method has no GAP alignment.
+    """
+    semantic = category.collect_semantic()["parents"].get(name)
+    if semantic is None or semantic.get("gap") is None:
+        raise ValueError("the method {} of {} has no GAP alignment".format(name, category))
+    return semantic
+
+def batch_call(parents, name, *args):
+    """
+    Return the results of calling the annotated method ``name`` on
+    each of the GAP backed ``parents``.
+
+    INPUT:
+
+    - ``parents`` -- an iterable of parents that are handles to GAP objects
+    - ``name`` -- the name of an annotated parent method with a GAP alignment
+    - ``args`` -- further arguments passed to the method
+
+    OUTPUT: the list of the results, in the order of ``parents``
+
+    The parents are grouped by category; for each group, the GAP
+    function is called on all the GAP objects in one go, and the
+    results are converted according to the annotated codomain: with a
+    single conversion of the whole list for ``Sage`` and ``bool``
+    codomains, and otherwise through the conversion function
+    compiled for the codomain (see
+    :func:`~sage.misc.semantic_codegen.conversion_function`). When the
+    codomain is not fully specified, the results are returned as GAP
+    handles. When the instrumentation is enabled, each group is
+    recorded as one call per parent, and the results are validated
+    (see :mod:`sage.misc.semantic_hooks`).
+    """
+    from sage.libs.gap.libgap import libgap
+    from sage.misc.sage_typing import Sage
+    from sage.misc.semantic_codegen import conversion_function
+    from sage.misc.semantic_hooks import hooks, method_category_name
+    parents = list(parents)
+    groups = {}
+    for (i, P) in enumerate(parents):
+        groups.setdefault(P.category(), []).append(i)
+    results = [None] * len(parents)
+    for (category, positions) in groups.items():
+        semantic = gap_semantic(category, name)
+        f = libgap.function_factory(semantic["gap"])
+        start = time.perf_counter()
+        values = _gap_list(libgap([parents[i].gap() for i in positions]), f, args)
+        middle = time.perf_counter()
+        codomain = semantic.get("codomain")
+        if codomain is Sage or codomain is bool:
+            values = values.sage()
+        else:
+            convert = conversion_function(codomain)
+            if convert is None:
+                values = list(values)
+            else:
+                values = [convert(parents[i], value) for (i, value) in zip(positions, values)]
+        if hooks.active:
+            key = (method_category_name(category, name), name)
+            if hooks.profiling:
+                hooks.add(key, len(positions), middle - start, time.perf_counter() - middle, values)
+            if hooks.validator is not None:
+                for (i, value) in zip(positions, values):
+                    hooks.validator(key, parents[i], codomain, value)
+        for (i, value) in zip(positions, values):
+            results[i] = value
+    return results
@@ -0,0 +1,294 @@
+r"""
+A bounded cache for the results of expensive annotated methods
+
+Methods annotated with ``cost="expensive"`` (e.g.
+``FiniteGroups.ParentMethods.conjugacy_classes`` or
+``Semigroups.Finite.ParentMethods.d_classes``) have their results
+memoized per parent in :data:`result_cache`: both their GAP backed
+implementations (see :mod:`sage.misc.semantic_codegen`) and their
+concrete Sage implementations, if any. Methods with no such
+annotation are not wrapped at all, and thus bear no overhead.
+
+The results are stored on the parents themselves, in the attribute
+``_semantic_cache``, as :func:`~sage.misc.sage_typing.specialize`
+does: a cached result referring to its parent (e.g. a list of
+elements, or a facade converting into them) thus does not keep the
+parent alive. The cache itself only holds weak references to the
+parents, together with the estimated sizes of their results (see
+:func:`estimate_size`): it keeps their total under a configurable
+budget by evicting the least recently used entries, and forgets the
+entries of a parent when it is garbage collected.
+
+EXAMPLES::
+
+    sage: import sage_annotations
+    sage: from mygap import mygap
+    sage: from sage.misc.semantic_cache import result_cache
+    sage: G = mygap.SymmetricGroup(4)
+    sage: G.conjugacy_classes() is G.conjugacy_classes()
+    True
+    sage: result_cache.statistics()['hits'] >= 1
+    True
+
+A cache can also be used directly::
+
+    sage: from sage.misc.semantic_cache import ResultCache, cached_semantic_method
+    sage: cache = ResultCache(budget=10000)
+    sage: class P(object):
+    ....:     def f(self, n):
+    ....:         print("computing")
+    ....:         return list(range(n))
+    ....:     f = cached_semantic_method(f, cache=cache)
+    sage: p = P()
+    sage: p.f(3)
+    computing
+    [0, 1, 2]
+    sage: p.f(3)
+    [0, 1, 2]
+    sage: cache.statistics()
+    {'entries': 1, 'evictions': 0, 'hits': 1, 'misses': 1, 'size': ...}
+
+Entries are evicted when the budget is exceeded::
+
+    sage: l = p.f(1000)
+    computing
+    sage: cache.statistics()['evictions']
+    2
+    sage: p.f(3)
+    computing
+    [0, 1, 2]
+
+and discarded with their parent::
+
+    sage: del p
+    sage: cache.statistics()['entries']
+    0
+
+even if their results refer to them::
+
+    sage: import gc, weakref
+    sage: class Q(object):
+    ....:     def g(self):
+    ....:         return [self]
+    ....:     g = cached_semantic_method(g, cache=cache)
+    sage: q = Q()
+    sage: q.g() == q.g()
+    True
+    sage: r = weakref.ref(q)
+    sage: del q; _ = gc.collect()
+    sage: r() is None, cache.statistics()['entries']
+    (True, 0)
+"""
+
+import collections
+import functools
+import sys
+import weakref
+
+def _gap_handle(value):
+    """
+    Return the GAP object held by ``value``, or ``None``.
+    """
+    if type(value).__module__ == "sage.libs.gap.element":
+        return value
+    if type(value).__name__ == "GAPFacade":
+        return value.gap()
+    return None
+
+def estimate_size(value, depth=2):
+    """
+    Return an estimate of the memory used by ``value``, in bytes.
+
+    Containers are recursed into up to ``depth`` levels. For GAP
+    objects, and the lazy facades over them (see
+    :class:`~sage.misc.semantic_codegen.GAPFacade`), this includes
+    the memory used in the GAP workspace, as measured by GAP's
+    ``MemoryUsage``. Other Sage objects wrapping GAP objects (e.g.
+    the elements of GAP parents) are only counted for their Python
+    part.
+
+    EXAMPLES::
+
+        sage: from sage.misc.semantic_cache import estimate_size
+        sage: import sys
+        sage: l = libgap.SymmetricGroup(5).AsList()
+        sage: estimate_size(l) > sys.getsizeof(l)
+        True
+    """
+    size = sys.getsizeof(value)
+    handle = _gap_handle(value)
+    if handle is not None:
+        from sage.libs.gap.libgap import libgap
+        return size + int(libgap.MemoryUsage(handle))
+    if depth and isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(x, depth-1) for x in value)
+    elif depth and isinstance(value, dict):
+        size += sum(estimate_size(k, depth-1) + estimate_size(v, depth-1) for k, v in value.items())
+    return size
+
+class ResultCache(object):
+    """
+    A cache of method results, per parent, with a memory budget and
+    least recently used eviction
+
+    INPUT:
+
+    - ``budget`` -- an integer (default: 64 MiB): the maximal total
+      estimated size of the cached results, in bytes
+    - ``sizeof`` -- a function (default: :func:`estimate_size`)
+      estimating the size of a result
+
+    The results are stored in the dictionary :data:`attribute` of
+    their parent; parents without a ``__dict__`` get no caching.
+    """
+    # The attribute of the parents holding their cached results
+    attribute = "_semantic_cache"
+
+    def __init__(self, budget=64*2**20, sizeof=estimate_size):
+        self.budget = budget
+        self.sizeof = sizeof
+        # (id(parent), name, args) -> size, in least recently used order
+        self._entries = collections.OrderedDict()
+        # id(parent) -> (weak reference to the parent, keys of its entries)
+        self._parents = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _results(self, parent):
+        """
+        Return the dictionary ``(name, args) -> result`` of ``parent``
+        in this cache, or ``None``.
+        """
+        try:
+            caches = parent.__dict__[self.attribute]
+        except KeyError:
+            return None
+        return caches.get(id(self))
+
+    def _discard_parent(self, parent_id):
+        """
+        Forget all the entries of a parent.
+        """
+        (ref, keys) = self._parents.pop(parent_id, (None, ()))
+        for key in keys:
+            self.size -= self._entries.pop(key)
+
+    def _evict(self):
+        while self.size > self.budget and self._entries:
+            (key, size) = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            (ref, keys) = self._parents[key[0]]
+            keys.discard(key)
+            parent = ref()
+            if parent is not None:
+                results = self._results(parent)
+                if results is not None:
+                    results.pop(key[1:], None)
+            if not keys:
+                del self._parents[key[0]]
+
+    def get(self, parent, name, args, compute):
+        """
+        Return ``compute(parent, *args)``, cached under ``name``.
+
+        If ``parent`` has no ``__dict__`` or cannot be weakly
+        referenced, or if ``args`` is not hashable, the result is
+        computed and not cached.
+        """
+        try:
+            d = parent.__dict__
+        except AttributeError:
+            return compute(parent, *args)
+        results = self._results(parent)
+        if results is not None:
+            try:
+                result = results[name, args]
+            except KeyError:
+                pass
+            except TypeError:
+                return compute(parent, *args)
+            else:
+                self._entries.move_to_end((id(parent), name, args))
+                self.hits += 1
+                return result
+        self.misses += 1
+        result = compute(parent, *args)
+        parent_id = id(parent)
+        key = (parent_id, name, args)
+        try:
+            hash(key)
+        except TypeError:
+            return result
+        if parent_id not in self._parents:
+            try:
+                ref = weakref.ref(parent, lambda ref: self._discard_parent(parent_id))
+            except TypeError:
+                return result
+            self._parents[parent_id] = (ref, set())
+        if results is None:
+            # Keyed by the cache, so that several caches can coexist
+            results = d.setdefault(self.attribute, {}).setdefault(id(self), {})
+        size = self.sizeof(result)
+        results[name, args] = result
+        self._entries[key] = size
+        self._parents[parent_id][1].add(key)
+        self.size += size
+        self._evict()
+        return result
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        for (ref, keys) in self._parents.values():
+            parent = ref()
+            if parent is not None:
+                results = self._results(parent)
+                if results is not None:
+                    results.clear()
+        self._entries.clear()
+        self._parents.clear()
+        self.size = 0
+
+    def set_budget(self, budget):
+        """
+        Set the memory budget to ``budget`` bytes, evicting entries as needed.
+        """
+        self.budget = budget
+        self._evict()
+
+    def statistics(self):
+        """
+        Return a dictionary with the number of entries, their
+        estimated total size, and the number of hits, misses and
+        evictions.
+        """
+        return {"entries": len(self._entries), "size": self.size,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+result_cache = ResultCache()
+
+def cached_semantic_method(f, name=None, cache=None):
+    """
+    Return a version of the method ``f`` whose results are cached.
+
+    INPUT:
+
+    - ``f`` -- a function ``(self, *args) -> result``
+    - ``name`` -- a string (default: the name of ``f``): the key of
+      the method in the cache
+    - ``cache`` -- a :class:`ResultCache` (default: :data:`result_cache`)
+    """
+    if name is None:
+        name = f.__name__
+    if cache is None:
+        cache = result_cache
+    get = cache.get
+    @functools.wraps(f)
+    def wrapper(self, *args):
+        return get(self, name, args, f)
+    wrapper.__wrapped_uncached__ = f
+    return wrapper
@@ -0,0 +1,222 @@
+r"""
+Checking the consistency of the annotations
+
+:func:`check` walks the annotated categories and their super
+categories once, and reports:
+
+- ``"conflict"``: a method annotated with different GAP or MMT names
+  in a category and in one of its super categories;
+- ``"shadowing"``: an annotated abstract method hiding a concrete
+  implementation in a super category;
+- ``"duplicate"``: a GAP filter used as ``gap`` annotation by
+  several categories;
+- ``"inconsistent"``: a GAP filter used in several of the ``gap``,
+  ``gap_sub``, ``gap_super`` and ``gap_negation`` annotations of a
+  category, or a category implying a filter whose negation is implied
+  by one of its super categories;
+- ``"uninstantiable"``: an annotated category of which no instance
+  could be constructed, and whose annotations could therefore not be
+  checked.
+
+EXAMPLES::
+
+    sage: import sage_annotations
+    sage: from sage.misc.semantic_check import check
+    sage: for issue in check(): print(issue)
+    shadowing: ...FiniteDimensional.ParentMethods.dimension: abstract, hides the implementation in ...ModulesWithBasis.ParentMethods
+    ...
+
+The check can be restricted to the categories annotated in some
+modules, together with their subcategories::
+
+    sage: check(modules=["semigroups"])
+    [...]
+
+From the command line, this exits with a non zero status if any issue
+is found::
+
+    sage -python -m sage_annotations.misc.semantic_check [module ...]
+"""
+
+import collections
+
+from sage.misc.abstract_method import AbstractMethod
+import sage.misc.sage_typing as sage_typing
+
+nested_classes = ["ParentMethods", "ElementMethods", "MorphismMethods"]
+
+gap_fields = ["gap", "gap_sub", "gap_super", "gap_negation"]
+
+class Issue(collections.namedtuple("Issue", ["kind", "category", "nested_class", "name", "message"])):
+    """
+    An issue found in the annotations
+
+    - ``kind`` -- ``"conflict"``, ``"shadowing"``, ``"duplicate"``,
+      ``"inconsistent"`` or ``"uninstantiable"``
+    - ``category`` -- the annotated category class
+    - ``nested_class`` -- the name of the nested class, or ``None``
+      for the annotations of the category itself
+    - ``name`` -- the name of the method, or of the annotation field
+    - ``message`` -- a string
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        location = [self.category.__name__, self.nested_class, self.name]
+        return "{}: {}: {}".format(self.kind, ".".join(x for x in location if x), self.message)
+
+def _module_name(cls):
+    """
+    Return the base name of the module holding the annotations of ``cls``.
+    """
+    if cls in sage_typing.annotated_categories:
+        return sage_typing.annotated_categories.module(cls).rsplit(".", 1)[-1]
+    return cls.__module__.rsplit(".", 1)[-1]
+
+def _nested_class_name(cls):
+    return "{}.{}".format(cls.__module__, cls.__qualname__)
+
+def check_methods(cls, supers):
+    """
+    Iterate through the issues of the annotated methods of ``cls``.
+
+    INPUT:
+
+    - ``cls`` -- an annotated category class
+    - ``supers`` -- the super categories of the instance of ``cls``,
+      as returned by ``all_super_categories()``
+    """
+    for nested_class_name in nested_classes:
+        own = cls.__dict__.get(nested_class_name)
+        if own is None or not own.__dict__.get("_semantic"):
+            continue
+        others = []
+        for category in supers:
+            nested_class = getattr(category, nested_class_name, None)
+            if nested_class is not None and nested_class is not own and nested_class not in others:
+                others.append(nested_class)
+        for (name, semantic) in own.__dict__["_semantic"].items():
+            abstract = isinstance(own.__dict__.get(name), AbstractMethod)
+            for nested_class in others:
+                other = nested_class.__dict__.get("_semantic", {}).get(name)
+                if other is not None:
+                    for field in ["gap", "mmt"]:
+                        if (semantic.get(field) is not None and other.get(field) is not None and
+                            semantic.get(field) != other.get(field)):
+                            yield Issue("conflict", cls, nested_class_name, name,
+                                        "{} name {!r} differs from {!r} in {}".format(
+                                            field, semantic.get(field), other.get(field),
+                                            _nested_class_name(nested_class)))
+                implementation = nested_class.__dict__.get(name)
+                if abstract and implementation is not None and not isinstance(implementation, AbstractMethod):
+                    yield Issue("shadowing", cls, nested_class_name, name,
+                                "abstract, hides the implementation in {}".format(
+                                    _nested_class_name(nested_class)))
+                    abstract = False
+
+def check_category(cls, supers, annotated):
+    """
+    Iterate through the issues of the GAP annotations of ``cls``.
+
+    INPUT:
+
+    - ``cls`` -- an annotated category class
+    - ``supers`` -- the super categories of the instance of ``cls``
+    - ``annotated`` -- a dictionary mapping the instances of the
+      annotated categories to their classes
+    """
+    semantic = cls.__dict__.get("_semantic", {})
+    fields = collections.defaultdict(list)
+    for field in gap_fields:
+        if semantic.get(field) is not None:
+            fields[semantic[field]].append(field)
+    for (name, used) in fields.items():
+        if len(used) > 1:
+            yield Issue("inconsistent", cls, None, used[0],
+                        "{!r} is also used as {}".format(name, " and ".join(used[1:])))
+    # Filters satisfied by all objects of cls (or, for gap_sub, by
+    # some), and whose negation is satisfied by all of them
+    positive = set(semantic.get(field) for field in ["gap", "gap_sub", "gap_super"]) - {None}
+    negative = semantic.get("gap_negation")
+    for category in supers[1:]:
+        other_cls = annotated.get(category)
+        if other_cls is None or other_cls is cls:
+            continue
+        other = other_cls.__dict__.get("_semantic", {})
+        if other.get("gap_negation") in positive:
+            yield Issue("inconsistent", cls, None, "gap_negation",
+                        "{!r} is negated in the super category {}".format(
+                            other["gap_negation"], other_cls.__name__))
+        if negative is not None and negative in (other.get("gap"), other.get("gap_super")):
+            yield Issue("inconsistent", cls, None, "gap_negation",
+                        "{!r} is implied by the super category {}".format(negative, other_cls.__name__))
+
+def check(modules=None, categories=None):
+    """
+    Return the issues found in the annotations.
+
+    INPUT:
+
+    - ``modules`` -- a list of module names (default: all), e.g.
+      ``"semigroups"`` or ``"sage_annotations.categories.semigroups"``;
+      if specified, only the categories annotated in these modules and
+      their subcategories are checked
+    - ``categories`` -- a list of annotated category classes
+      (default: all the annotated categories)
+
+    OUTPUT: a list of :class:`Issue`
+
+    The categories of which no instance can be constructed are
+    reported rather than skipped::
+
+        sage: class Foo(object): pass
+        sage: for issue in check(categories=[Foo]): print(issue)
+        uninstantiable: Foo: no instance could be constructed: ...
+    """
+    from sage.misc.semantic_resolver import category_instance
+    if categories is None:
+        categories = sage_typing.annotated_categories
+    categories = list(collections.OrderedDict.fromkeys(categories))
+    supers = {}
+    annotated = {}
+    names = None if modules is None else set(module.rsplit(".", 1)[-1] for module in modules)
+    issues = []
+    for cls in categories:
+        try:
+            instance = category_instance(cls)
+        except Exception as e:
+            if names is None or _module_name(cls) in names:
+                issues.append(Issue("uninstantiable", cls, None, None,
+                                    "no instance could be constructed: {}: {}".format(type(e).__name__, e)))
+            continue
+        supers[cls] = instance.all_super_categories()
+        annotated[instance] = cls
+    if names is not None:
+        changed = set(instance for (instance, cls) in annotated.items() if _module_name(cls) in names)
+        categories = [cls for cls in supers if any(category in changed for category in supers[cls])]
+    gap_names = collections.defaultdict(list)
+    for cls in supers:
+        gap = cls.__dict__.get("_semantic", {}).get("gap")
+        if gap is not None:
+            gap_names[gap].append(cls)
+    for cls in categories:
+        if cls not in supers:
+            continue
+        issues.extend(check_methods(cls, supers[cls]))
+        issues.extend(check_category(cls, supers[cls], annotated))
+        gap = cls.__dict__.get("_semantic", {}).get("gap")
+        if gap is not None and len(gap_names[gap]) > 1:
+            issues.append(Issue("duplicate", cls, None, "gap",
+                                "{!r} is also the gap annotation of {}".format(
+                                    gap, ", ".join(other.__name__ for other in gap_names[gap] if other is not cls))))
+    return issues
+
+if __name__ == "__main__":
+    import sys
+    import sage.all
+    import sage_annotations
+    from sage.misc.semantic_check import check
+    issues = check(modules=sys.argv[1:] or None)
+    for issue in issues:
+        print(issue)
+    sys.exit(1 if issues else 0)
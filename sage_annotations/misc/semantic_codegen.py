@@ -0,0 +1,624 @@
+r"""
+Generating GAP backed implementations of annotated methods
+
+For a method annotated with a GAP name and a codomain, e.g.::
+
+    @semantic(mmt="neutral", gap="Zero", codomain=Self)
+    @abstract_method
+    def zero(self):
+        pass
+
+this generates, for parents that are handles to GAP objects (as in
+the ``GAP`` axiom categories), the specialized implementation::
+
+    def zero(self):
+        if _hooks.active:
+            return _hooks.record(_key, self, lambda: F(self.gap()), _convert, _codomain)
+        x = F(self.gap())
+        return self(x)
+
+where ``F`` is the GAP function ``Zero``. The GAP function is
+resolved once, upon the first call, and the conversion of the result
+according to the codomain is inlined in the code. When the
+instrumentation is enabled, the call is recorded instead by
+:data:`~sage.misc.semantic_hooks.hooks`.
+
+Only methods whose codomain is fully specified get generated, that
+is whose codomain is built from ``Self``, ``ParentOfSelf``,
+``FacadeFor``, ``Sage`` and ``bool`` using ``List``, ``Family``,
+``Facade`` and ``Iterator``; the others are left to the generic
+handling of GAP objects. ``Facade[...]`` results are converted lazily,
+as :class:`GAPFacade`'s, and ``List[...]`` and ``Family[...]`` results
+of elements in bulk (see :func:`bulk_elements`).
+
+EXAMPLES::
+
+    sage: import sage_annotations
+    sage: from sage.misc.semantic_codegen import generate_method, conversion_code
+    sage: from sage.misc.sage_typing import Facade, Family, List, Self, Sage
+    sage: conversion_code(Family[Self], "x", "parent")
+    'Family(bulk_elements(self, x))'
+    sage: conversion_code(List[List[Sage]], "x", "element")
+    '[[x1.sage() for x1 in x0] for x0 in x]'
+    sage: conversion_code(Facade[Facade[Self]], "x", "parent")
+    'GAPFacade(x, lambda x0: GAPFacade(x0, lambda x1: self(x1)))'
+    sage: conversion_code(List, "x", "parent") is None
+    True
+
+    sage: from sage.categories.semigroups import Semigroups
+    sage: semantic = Semigroups.ParentMethods._semantic['semigroup_generators']
+    sage: print(generate_method("semigroup_generators", semantic).__source__)
+    def semigroup_generators(self):
+        if _hooks.active:
+            return _hooks.record(_key, self, lambda: F(self.gap()), _convert, _codomain)
+        x = F(self.gap())
+        return Family(bulk_elements(self, x))
+"""
+
+from sage.misc.sage_typing import DependentType, Sage, _Facade, wrap_implementation
+from sage.misc.semantic_cache import cached_semantic_method
+import sage.sets.family
+
+class LazyGAPFunction(object):
+    """
+    A placeholder for the GAP function ``name`` in the namespace of
+    generated code
+
+    Upon the first call, the GAP function is resolved and replaces
+    the placeholder in the namespace.
+
+    EXAMPLES::
+
+        sage: from sage.misc.semantic_codegen import LazyGAPFunction
+        sage: namespace = {}
+        sage: F = namespace["F"] = LazyGAPFunction("Size", namespace, "F")
+        sage: F(libgap.SymmetricGroup(3))
+        6
+        sage: namespace["F"]
+        <Gap function "Size">
+    """
+    def __init__(self, name, namespace, key):
+        self._name = name
+        self._namespace = namespace
+        self._key = key
+
+    def __call__(self, *args):
+        from sage.libs.gap.libgap import libgap
+        f = libgap.function_factory(self._name)
+        self._namespace[self._key] = f
+        return f(*args)
+
+def gap_iterator(iterator):
+    """
+    Iterate through the GAP iterator ``iterator``.
+
+    EXAMPLES::
+
+        sage: from sage.misc.semantic_codegen import gap_iterator
+        sage: list(gap_iterator(libgap.Iterator(libgap([1,2,3]))))
+        [1, 2, 3]
+    """
+    from sage.libs.gap.libgap import libgap
+    IsDoneIterator = libgap.IsDoneIterator
+    NextIterator = libgap.NextIterator
+    while not IsDoneIterator(iterator):
+        yield NextIterator(iterator)
+
+class GAPFacade(object):
+    r"""
+    A lazy facade for the GAP collection ``handle``
+
+    INPUT:
+
+    - ``handle`` -- a GAP collection or list
+    - ``convert`` -- a function converting the GAP items of ``handle``
+
+    This is the result of methods with codomain ``Facade[...]``: the
+    items are only converted from GAP when accessed, and the length is
+    computed by GAP's ``Size`` without enumerating the collection.
+    Positional access goes through GAP's ``Enumerator``, which for
+    many collections (e.g. Green's classes) does not build the list
+    of all elements.
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from sage.misc.semantic_codegen import GAPFacade
+        sage: G = libgap.SymmetricGroup(3)
+        sage: classes = GAPFacade(G.ConjugacyClasses(), lambda c: GAPFacade(c, lambda x: x.sage()))
+        sage: len(classes)
+        3
+        sage: c = classes[1]; c
+        Facade for 3 elements of (1,2)^G
+        sage: len(c)
+        3
+        sage: list(c)
+        [(1,2), (1,3), (2,3)]
+        sage: [len(c) for c in classes]
+        [1, 3, 2]
+
+    Membership is tested by GAP, without converting the items::
+
+        sage: libgap.eval("(1,2,3)") in classes[2]
+        True
+        sage: c in classes, classes[0] in c
+        (True, False)
+    """
+    __slots__ = ("_handle", "_convert", "_len", "_enumerator")
+
+    def __init__(self, handle, convert):
+        self._handle = handle
+        self._convert = convert
+        self._len = None
+        self._enumerator = None
+
+    def gap(self):
+        """
+        Return the underlying GAP collection.
+        """
+        return self._handle
+
+    def __len__(self):
+        if self._len is None:
+            from sage.libs.gap.libgap import libgap
+            self._len = int(libgap.Size(self._handle))
+        return self._len
+
+    def __iter__(self):
+        from sage.libs.gap.libgap import libgap
+        convert = self._convert
+        if self._handle.IsList():
+            for x in self._handle:
+                yield convert(x)
+        else:
+            for x in gap_iterator(libgap.Iterator(self._handle)):
+                yield convert(x)
+
+    def __contains__(self, x):
+        from sage.libs.gap.libgap import libgap
+        try:
+            return bool(libgap.function_factory("\\in")(_to_gap(x), self._handle))
+        except (TypeError, ValueError):
+            return False
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("facade index out of range")
+        if self._enumerator is None:
+            if self._handle.IsList():
+                self._enumerator = self._handle
+            else:
+                from sage.libs.gap.libgap import libgap
+                self._enumerator = libgap.Enumerator(self._handle)
+        return self._convert(self._enumerator[i])
+
+    def __repr__(self):
+        return "Facade for {} elements of {}".format(len(self), self._handle)
+
+def _to_gap(x):
+    """
+    Return a GAP handle for ``x``.
+    """
+    try:
+        return x.gap()
+    except AttributeError:
+        from sage.libs.gap.libgap import libgap
+        return libgap(x)
+
+# The code building an object of self (resp. of the parent of self)
+# from a GAP handle, depending on whether self is a parent or an
+# element
+_constructors = {
+    ("parent", "Self"): "self({})",
+    ("parent", "ParentOfSelf"): "self.parent()({})",
+    ("parent", "FacadeFor"): "self.facade_for()[0]({})",
+    ("element", "Self"): "self.parent()({})",
+    ("element", "ParentOfSelf"): "self.parent()({})",
+    ("element", "FacadeFor"): "self.parent().facade_for()[0]({})",
+}
+
+# The code computing the parent of the objects built by the above
+_parents = {
+    ("parent", "Self"): "self",
+    ("parent", "ParentOfSelf"): "self.parent()",
+    ("parent", "FacadeFor"): "self.facade_for()[0]",
+    ("element", "Self"): "self.parent()",
+    ("element", "ParentOfSelf"): "self.parent()",
+    ("element", "FacadeFor"): "self.parent().facade_for()[0]",
+}
+
+def bulk_elements(parent, handles):
+    r"""
+    Return the list of the elements of ``parent`` wrapping the GAP
+    objects in the GAP list ``handles``.
+
+    This is the conversion of ``List[Self]`` and ``Family[Self]``
+    results (and likewise for ``ParentOfSelf`` and ``FacadeFor``):
+    if ``parent`` implements ``_from_gap_bulk_(handles)``, this is
+    used to build all the elements at once (e.g. Lie algebras of
+    matrices fetch all the matrices in a single call to GAP, see
+    :func:`gap_matrices_to_numpy`); otherwise, see
+    :func:`wrap_elements`.
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from mygap import mygap
+        sage: from sage.misc.semantic_codegen import bulk_elements
+        sage: G = mygap.SymmetricGroup(3)
+        sage: l = bulk_elements(G, G.gap().AsList())
+        sage: l
+        [(), (1,3), (1,2,3), (2,3), (1,3,2), (1,2)]
+        sage: all(x.parent() is G for x in l)
+        True
+    """
+    try:
+        bulk = parent._from_gap_bulk_
+    except AttributeError:
+        pass
+    else:
+        return bulk(handles)
+    return wrap_elements(parent, handles)
+
+def wrap_elements(parent, handles):
+    """
+    Return the list of the elements of ``parent`` wrapping the GAP
+    objects in the GAP list ``handles``, one at a time.
+
+    If the elements of ``parent`` are built directly by its element
+    class (the default element constructor), the element class is
+    called on each handle, bypassing the coercion framework;
+    otherwise, ``parent`` is called on each handle.
+    """
+    constructor = getattr(parent, "_element_constructor_", None)
+    if getattr(constructor, "__name__", None) == "_element_constructor_from_element_class":
+        cls = parent.element_class
+        return [cls(parent, handle) for handle in handles]
+    return [parent(handle) for handle in handles]
+
+def gap_matrices_to_numpy(handles, dtype=None):
+    r"""
+    Return the GAP list ``handles`` of matrices of the same dimension
+    as a three dimensional NumPy array.
+
+    INPUT:
+
+    - ``handles`` -- a GAP list of `n` matrices of size `k\times m`
+    - ``dtype`` -- a NumPy data type (default: ``int64`` if all the
+      entries are integers fitting in it, and ``object`` otherwise)
+
+    OUTPUT: a NumPy array of shape `(n, k, m)`
+
+    The entries are fetched from GAP with a single call to ``Flat``
+    and converted at once, which makes this suitable for implementing
+    ``_from_gap_bulk_`` for parents whose elements are matrices (see
+    :func:`bulk_elements`).
+
+    EXAMPLES::
+
+        sage: from sage.misc.semantic_codegen import gap_matrices_to_numpy
+        sage: a = gap_matrices_to_numpy(libgap([[[0, 1], [0, 0]], [[0, 0], [1, 0]]]))
+        sage: a.shape, a.dtype
+        ((2, 2, 2), dtype('int64'))
+        sage: a[1]
+        array([[0, 0],
+               [1, 0]])
+        sage: gap_matrices_to_numpy(libgap([[[1/2]]]))
+        array([[[1/2]]], dtype=object)
+    """
+    import numpy
+    from sage.libs.gap.libgap import libgap
+    n = int(libgap.Length(handles))
+    if n:
+        (k, m) = libgap.DimensionsMat(handles[0]).sage()
+    else:
+        (k, m) = (0, 0)
+    entries = libgap.Flat(handles).sage()
+    if dtype is None:
+        from sage.rings.integer import Integer
+        bound = numpy.iinfo(numpy.int64).max
+        if all(type(entry) is Integer and -bound <= entry <= bound for entry in entries):
+            dtype = numpy.int64
+        else:
+            dtype = object
+    if dtype is object:
+        result = numpy.empty(len(entries), dtype=object)
+        result[:] = entries
+    else:
+        result = numpy.array(entries, dtype=dtype)
+    return result.reshape((n, k, m))
+
+def conversion_code(codomain, var, context, depth=0):
+    """
+    Return the code converting the GAP handle ``var`` according to ``codomain``.
+
+    INPUT:
+
+    - ``codomain`` -- a type
+    - ``var`` -- a string: the name of the variable holding the GAP handle
+    - ``context`` -- ``"parent"`` or ``"element"``: whether the
+      code is run in a parent or an element method
+    - ``depth`` -- an integer, used to name loop variables
+
+    OUTPUT: a string, or ``None`` if the codomain is not fully specified
+    """
+    if codomain is Sage or codomain is bool:
+        return "{}.sage()".format(var)
+    if isinstance(codomain, DependentType):
+        template = _constructors.get((context, codomain.name))
+        if template is None:
+            return None
+        return template.format(var)
+    origin = getattr(codomain, "__origin__", None)
+    args = getattr(codomain, "__args__", ())
+    if origin is None or len(args) != 1:
+        return None
+    if (origin is list or origin is sage.sets.family.TrivialFamily) and isinstance(args[0], DependentType):
+        parent = _parents.get((context, args[0].name))
+        if parent is None:
+            return None
+        code = "bulk_elements({}, {})".format(parent, var)
+        if origin is list:
+            return code
+        return "Family({})".format(code)
+    inner_var = "x{}".format(depth)
+    inner = conversion_code(args[0], inner_var, context, depth+1)
+    if inner is None:
+        return None
+    if origin is list:
+        return "[{} for {} in {}]".format(inner, inner_var, var)
+    if origin is sage.sets.family.TrivialFamily:
+        return "Family([{} for {} in {}])".format(inner, inner_var, var)
+    if origin is _Facade:
+        return "GAPFacade({}, lambda {}: {})".format(var, inner_var, inner)
+    if getattr(codomain, "_name", None) == "Iterator":
+        return "({} for {} in gap_iterator({}))".format(inner, inner_var, var)
+    return None
+
+def _namespace(gap_name=None):
+    """
+    Return a fresh namespace for generated code calling ``gap_name``.
+    """
+    namespace = {
+        "Family": sage.sets.family.Family,
+        "gap_iterator": gap_iterator,
+        "bulk_elements": bulk_elements,
+        "_to_gap": _to_gap,
+    }
+    if gap_name is not None:
+        namespace["F"] = LazyGAPFunction(gap_name, namespace, "F")
+    namespace["GAPFacade"] = GAPFacade
+    return namespace
+
+# (codomain, context) -> conversion function
+_conversion_functions = {}
+
+def conversion_function(codomain, context="parent"):
+    """
+    Return a function ``(self, x) -> y`` converting the GAP handle
+    ``x`` according to ``codomain``.
+
+    INPUT:
+
+    - ``codomain`` -- a type
+    - ``context`` -- ``"parent"`` or ``"element"`` (default:
+      ``"parent"``): whether ``self`` is a parent or an element
+
+    OUTPUT: a function, or ``None`` if the codomain is not fully
+    specified (see :func:`conversion_code`)
+
+    The functions are compiled once per codomain and context.
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from sage.misc.semantic_codegen import conversion_function
+        sage: from sage.misc.sage_typing import List, Sage
+        sage: f = conversion_function(List[Sage])
+        sage: f(None, libgap([1, 2, 3]))
+        [1, 2, 3]
+        sage: conversion_function(List[Sage]) is f
+        True
+    """
+    key = (codomain, context)
+    try:
+        return _conversion_functions[key]
+    except KeyError:
+        pass
+    conversion = conversion_code(codomain, "x", context)
+    if conversion is None:
+        f = None
+    else:
+        namespace = _namespace()
+        exec(compile("def convert(self, x):\n    return {}\n".format(conversion),
+                     "<generated conversion to {}>".format(codomain), "exec"),
+             namespace)
+        f = namespace["convert"]
+    _conversion_functions[key] = f
+    return f
+
+def generate_method(name, semantic, context="parent", gap_name=None, category=None):
+    """
+    Return a GAP backed implementation of the method ``name``.
+
+    INPUT:
+
+    - ``name`` -- the name of the method
+    - ``semantic`` -- the semantic information about the method
+    - ``context`` -- ``"parent"`` or ``"element"`` (default: ``"parent"``)
+    - ``gap_name`` -- a string (default: ``semantic['gap']``): the
+      GAP function to call
+    - ``category`` -- a string (default: ``None``): the name of the
+      category, under which the calls are recorded when the
+      instrumentation is enabled (see :mod:`sage.misc.semantic_hooks`)
+
+    OUTPUT: a function, or ``None`` if the method has no GAP name,
+    if its codomain is not fully specified, or if its signature
+    involves default values or variable arguments
+
+    If the method is annotated with ``cost="expensive"``, its results
+    are cached (see :mod:`sage.misc.semantic_cache`).
+
+    The source of the generated function is stored in its attribute
+    ``__source__``.
+    """
+    if gap_name is None:
+        gap_name = semantic.get("gap")
+    if gap_name is None:
+        return None
+    conversion = conversion_code(semantic.get("codomain"), "x", context)
+    if conversion is None:
+        return None
+    argspec = semantic["argspec"]
+    if argspec.varargs or getattr(argspec, "keywords", getattr(argspec, "varkw", None)) or argspec.defaults:
+        return None
+    args = list(argspec.args)
+    if args and args[0] == "self":
+        args = args[1:]
+    if context == "element":
+        gap_args = ["{}.gap()".format(arg) for arg in args]
+    else:
+        gap_args = ["_to_gap({})".format(arg) for arg in args]
+    source = ("def {name}({args}):\n"
+              "    if _hooks.active:\n"
+              "        return _hooks.record(_key, self, lambda: F({gap_args}), _convert, _codomain)\n"
+              "    x = F({gap_args})\n"
+              "    return {conversion}\n").format(
+                  name=name,
+                  args=", ".join(["self"] + args),
+                  gap_args=", ".join(["self.gap()"] + gap_args),
+                  conversion=conversion)
+    from sage.misc.semantic_hooks import hooks
+    namespace = _namespace(gap_name)
+    namespace["_hooks"] = hooks
+    namespace["_key"] = (category, name)
+    namespace["_convert"] = conversion_function(semantic.get("codomain"), context)
+    namespace["_codomain"] = semantic.get("codomain")
+    code = compile(source, "<generated GAP method {}>".format(name), "exec")
+    exec(code, namespace)
+    f = namespace[name]
+    f.__source__ = source
+    if semantic.get("cost") == "expensive":
+        f = cached_semantic_method(f, name)
+    return f
+
+nested_classes = [("ParentMethods", "parent"), ("ElementMethods", "element")]
+
+def deferred_method(name, semantic, context="parent", category=None):
+    """
+    Return a method generating its GAP backed implementation upon its first call.
+
+    INPUT: as for :func:`generate_method`, except that ``category``
+    is the class holding the annotations of the method; the name of
+    the Sage category class they are monkey patched into, under which
+    the calls are recorded, is looked up upon generation (see
+    :func:`~sage.misc.semantic_hooks.source_category_name`)
+
+    This lets :func:`populate_gap_category` install the methods
+    without computing their argspecs, which is only done by
+    :func:`generate_method` when they are first called. The
+    generated implementation then replaces the deferred method in
+    the class it was found in. If none can be generated (e.g. for a
+    signature with default values), the call is passed to the next
+    implementation in the method resolution order.
+
+    The generated implementation is also returned by the attribute
+    ``__generate__`` of the deferred method.
+    """
+    generated = []
+
+    def generate():
+        if not generated:
+            from sage.misc.semantic_hooks import source_category_name
+            category_name = None if category is None else source_category_name(category)
+            generated.append(generate_method(name, semantic, context, category=category_name))
+        return generated[0]
+
+    def method(self, *args):
+        f = generate()
+        for cls in type(self).__mro__:
+            if cls.__dict__.get(name) is method:
+                break
+        else:
+            cls = None
+        if f is None:
+            if cls is None:
+                raise NotImplementedError("no GAP backed implementation of {}".format(name))
+            return getattr(super(cls, self), name)(*args)
+        if cls is not None:
+            setattr(cls, name, f)
+        return f(self, *args)
+
+    method.__name__ = name
+    method.__doc__ = "GAP backed implementation of ``{}``, generated upon its first call".format(name)
+    method.__generate__ = generate
+    return method
+
+def populate_gap_category(cls):
+    """
+    Generate GAP backed implementations of the annotated methods of
+    the category class ``cls`` into ``cls.GAP``.
+
+    For each annotated parent (resp. element) method of ``cls`` with
+    a GAP name and a fully specified codomain (see
+    :func:`conversion_code`), a :func:`deferred_method` is inserted
+    into ``cls.GAP.ParentMethods`` (resp. ``cls.GAP.ElementMethods``),
+    unless the latter already defines this method; the implementation
+    is generated upon the first call. The implementations written by
+    hand in ``cls.GAP`` are wrapped as the concrete implementations of
+    annotated methods (see
+    :func:`~sage.misc.sage_typing.wrap_implementation`): they are
+    instrumented, and cached if expensive.
+
+    This is called by :func:`~sage.misc.sage_typing.harvest_class` for
+    annotated categories with a ``GAP`` axiom, that is the categories
+    of Lie algebras, quivers and quiver algebras, finite semigroups
+    and finite groups. Annotated methods of other categories are only
+    generated by :mod:`~sage.misc.semantic_batch` and
+    :mod:`~sage.misc.semantic_routing`.
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from sage.categories.quiver_algebras import Quivers
+        sage: print(Quivers.GAP.ParentMethods.vertices.__generate__().__source__)
+        def vertices(self):
+            if _hooks.active:
+                return _hooks.record(_key, self, lambda: F(self.gap()), _convert, _codomain)
+            x = F(self.gap())
+            return bulk_elements(self, x)
+
+    The conjugacy classes of a GAP group are converted lazily::
+
+        sage: from mygap import mygap
+        sage: G = mygap.SymmetricGroup(3)
+        sage: classes = G.conjugacy_classes(); classes
+        Facade for 3 elements of [ ()^G, (1,2)^G, (1,2,3)^G ]
+        sage: type(classes)
+        <class 'sage.misc.semantic_codegen.GAPFacade'>
+        sage: sorted(len(c) for c in classes)
+        [1, 2, 3]
+    """
+    GAP = cls.__dict__.get("GAP")
+    if GAP is None:
+        return
+    for (nested_class_name, context) in nested_classes:
+        nested_class = cls.__dict__.get(nested_class_name)
+        if nested_class is None:
+            continue
+        target = GAP.__dict__.get(nested_class_name)
+        for (name, semantic) in nested_class.__dict__.get("_semantic", {}).items():
+            if target is not None and name in target.__dict__:
+                setattr(target, name, wrap_implementation(target.__dict__[name], name, semantic, cls))
+                continue
+            if semantic.get("gap") is None or conversion_code(semantic.get("codomain"), "x", context) is None:
+                continue
+            f = deferred_method(name, semantic, context, category=cls)
+            if target is None:
+                target = type(nested_class_name, (object,), {})
+                setattr(GAP, nested_class_name, target)
+            setattr(target, name, f)
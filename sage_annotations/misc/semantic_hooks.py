@@ -0,0 +1,288 @@
+r"""
+Instrumentation of the annotated methods calling GAP
+
+When enabled, :data:`hooks` records, for each GAP backed
+implementation of an annotated method (see
+:mod:`sage.misc.semantic_codegen`) and for each batched call (see
+:mod:`sage.misc.semantic_batch`), the number of calls, the time spent
+in GAP, the time spent converting the results to Sage, and the
+estimated size of the results (see
+:func:`~sage.misc.semantic_cache.estimate_size`). The concrete
+implementations written by hand of the methods with a GAP alignment
+are recorded too (see :func:`instrumented_method`), as a whole under
+the time spent in GAP.
+
+The measures are keyed by the name of the annotated Sage category
+class holding the annotation of the method (see
+:func:`method_category_name`), and by the name of the method.
+
+When disabled, which is the default, the generated code only tests
+the attribute :attr:`Hooks.active`.
+
+EXAMPLES::
+
+    sage: import sage_annotations
+    sage: from mygap import mygap
+    sage: from sage.misc.semantic_hooks import hooks
+    sage: with hooks:
+    ....:     len(mygap.SymmetricGroup(3).conjugacy_classes())
+    ....:     len(mygap.SymmetricGroup(4).conjugacy_classes())
+    3
+    5
+    sage: hooks.snapshot()
+    {('FiniteGroups', 'conjugacy_classes'): {'calls': 2, 'conversion_time': ..., 'gap_time': ...,
+                                            'max_size': ..., 'size': ...}}
+    sage: print(hooks.report())
+    category      method             calls  GAP (s)  conversion (s)  size (B)
+    FiniteGroups  conjugacy_classes      2      ...             ...       ...
+    sage: hooks.reset()
+
+The results of ``conjugacy_classes``, which is expensive, are cached;
+calls answered from the cache are not recorded.
+
+Implementations written by hand are recorded as well::
+
+    sage: from mmt import LieAlgebras
+    sage: L = LieAlgebras(Rings()).GAP().example()
+    sage: with hooks:
+    ....:     L.is_lie_solvable()
+    False
+    sage: hooks.snapshot()[('LieAlgebras', 'is_lie_solvable')]['calls']
+    1
+    sage: hooks.reset()
+"""
+
+import functools
+import time
+
+from sage.misc.sage_typing import annotated_categories
+from sage.misc.semantic_cache import estimate_size
+
+class MethodStatistics(object):
+    """
+    The measures for a method
+    """
+    __slots__ = ("calls", "gap_time", "conversion_time", "size", "max_size")
+
+    def __init__(self):
+        self.calls = 0
+        self.gap_time = 0.0
+        self.conversion_time = 0.0
+        self.size = 0
+        self.max_size = 0
+
+    def as_dict(self):
+        return {"calls": self.calls, "gap_time": self.gap_time,
+                "conversion_time": self.conversion_time,
+                "size": self.size, "max_size": self.max_size}
+
+class Hooks(object):
+    """
+    The switch and the measures of the instrumentation
+
+    Use :meth:`enable` and :meth:`disable`, or ``with hooks:``, to
+    record measures. A validator of the results (see
+    :mod:`sage.misc.semantic_validation`) can also be plugged in with
+    :meth:`set_validator`; :attr:`active` is set whenever either is on.
+    """
+    def __init__(self):
+        self.active = False
+        self.profiling = False
+        self.validator = None
+        # (category name, method name) -> MethodStatistics
+        self._statistics = {}
+
+    def _update(self):
+        self.active = self.profiling or self.validator is not None
+
+    def enable(self):
+        self.profiling = True
+        self._update()
+
+    def disable(self):
+        self.profiling = False
+        self._update()
+
+    def set_validator(self, validator):
+        """
+        Set the function called on the results, or ``None``.
+
+        It is called as ``validator(key, parent, codomain, result)``.
+        """
+        self.validator = validator
+        self._update()
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.disable()
+
+    def add(self, key, calls, gap_time, conversion_time, result):
+        """
+        Record ``calls`` calls to the method ``key``, which took
+        ``gap_time`` and ``conversion_time`` seconds and produced ``result``.
+        """
+        try:
+            statistics = self._statistics[key]
+        except KeyError:
+            statistics = self._statistics[key] = MethodStatistics()
+        size = estimate_size(result)
+        statistics.calls += calls
+        statistics.gap_time += gap_time
+        statistics.conversion_time += conversion_time
+        statistics.size += size
+        statistics.max_size = max(statistics.max_size, size)
+
+    def record(self, key, parent, gap_call, convert, codomain=None):
+        """
+        Return ``convert(parent, gap_call())``, recording the call to
+        the method ``key`` and validating its result against ``codomain``.
+
+        This is called by the generated code when :attr:`active` is set.
+        """
+        start = time.perf_counter()
+        x = gap_call()
+        middle = time.perf_counter()
+        result = convert(parent, x)
+        if self.profiling:
+            self.add(key, 1, middle - start, time.perf_counter() - middle, result)
+        if self.validator is not None:
+            self.validator(key, parent, codomain, result)
+        return result
+
+    def snapshot(self):
+        """
+        Return a copy of the measures, as a dictionary ``(category
+        name, method name) -> measures``.
+        """
+        return {key: statistics.as_dict() for (key, statistics) in self._statistics.items()}
+
+    def report(self):
+        """
+        Return a text table of the measures, by decreasing total time.
+        """
+        header = ("category", "method", "calls", "GAP (s)", "conversion (s)", "size (B)")
+        rows = [(category, method, str(s.calls), "{:.6f}".format(s.gap_time),
+                 "{:.6f}".format(s.conversion_time), str(s.size))
+                for ((category, method), s) in sorted(self._statistics.items(),
+                                                      key=lambda item: -item[1].gap_time-item[1].conversion_time)]
+        widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+        lines = []
+        for row in [header] + rows:
+            lines.append("  ".join(cell.ljust(width) if i < 2 else cell.rjust(width)
+                                   for (i, (cell, width)) in enumerate(zip(row, widths))).rstrip())
+        return "\n".join(lines)
+
+    def reset(self):
+        """
+        Forget all measures.
+        """
+        self._statistics.clear()
+
+hooks = Hooks()
+
+def category_name(category):
+    """
+    Return the name of the annotated category class of ``category``,
+    used in the keys of the measures.
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from sage.misc.semantic_hooks import category_name
+        sage: category_name(Semigroups().Finite())
+        'FiniteSemigroups'
+        sage: category_name(Groups().Finite())
+        'FiniteGroups'
+    """
+    for cls in type(category).__mro__:
+        if cls in annotated_categories:
+            return cls.__name__
+    return repr(category)
+
+def method_category_name(category, name, nested_class="ParentMethods"):
+    """
+    Return the name of the annotated category class holding the
+    annotation of the method ``name`` of ``category``.
+
+    INPUT:
+
+    - ``category`` -- a category
+    - ``name`` -- the name of a method
+    - ``nested_class`` -- the name of the nested class holding the
+      method (default: ``"ParentMethods"``)
+
+    This is the most specific super category of ``category`` whose
+    class annotates the method, or else ``category`` itself (see
+    :func:`category_name`).
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from sage.misc.semantic_hooks import method_category_name
+        sage: method_category_name(Monoids().Finite(), "l_classes")
+        'FiniteSemigroups'
+        sage: method_category_name(Monoids().Finite(), "monoid_generators")
+        'Monoids'
+    """
+    for C in category.all_super_categories():
+        for cls in type(C).__mro__:
+            if cls in annotated_categories:
+                if name in getattr(cls.__dict__.get(nested_class), "_semantic", {}):
+                    return cls.__name__
+                break
+    return category_name(category)
+
+def source_category_name(source):
+    """
+    Return the name of the annotated category class whose annotations
+    are held by the class ``source``.
+
+    The annotation classes are monkey patched into the Sage category
+    classes, under which the measures are recorded; e.g. the
+    annotations of ``Semigroups.Finite`` are those of
+    ``FiniteSemigroups``::
+
+        sage: import sage_annotations
+        sage: from sage.misc.semantic_hooks import source_category_name
+        sage: from sage_annotations.categories.semigroups import Semigroups
+        sage: source_category_name(Semigroups.Finite)
+        'FiniteSemigroups'
+    """
+    try:
+        return annotated_categories.target(source).__name__
+    except KeyError:
+        return source.__name__
+
+def _identity(parent, x):
+    return x
+
+def instrumented_method(f, name, category, codomain=None):
+    """
+    Return a version of the method ``f`` recorded by :data:`hooks`.
+
+    INPUT:
+
+    - ``f`` -- a function ``(self, *args, **kwds) -> result``
+    - ``name`` -- the name of the method
+    - ``category`` -- the class holding the annotation of the
+      method; the key of the measures is computed upon the first
+      recorded call (see :func:`source_category_name`)
+    - ``codomain`` -- the annotated codomain, against which the
+      results are validated (default: ``None``)
+
+    This is used for the concrete implementations of the methods with
+    a GAP alignment which are not generated. The whole call is
+    recorded as time spent in GAP.
+    """
+    key = []
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwds):
+        if not hooks.active:
+            return f(self, *args, **kwds)
+        if not key:
+            key.append((source_category_name(category), name))
+        return hooks.record(key[0], self, lambda: f(self, *args, **kwds), _identity, codomain)
+    return wrapper
@@ -0,0 +1,153 @@
+r"""
+Index of the GAP and MMT alignments of the annotations
+
+The index maps GAP and MMT names to the annotated categories and
+methods carrying them, so that translating a GAP object does not
+require scanning the output of
+:meth:`~sage.categories.category.Category.collect_semantic`.
+
+EXAMPLES::
+
+    sage: import sage_annotations
+    sage: from sage.misc.semantic_index import semantic_index
+    sage: index = semantic_index()
+    sage: index.methods_by_gap("GreensDClasses")
+    (MethodEntry(category=<class 'sage.categories.finite_semigroups.FiniteSemigroups'>,
+                 nested_class='ParentMethods', name='d_classes', semantic={...}),)
+    sage: index.methods_by_mmt("neutral")
+    (MethodEntry(category=<class 'sage.categories.magmas.Magmas'>,
+                 nested_class='ParentMethods', name='one', semantic={...}),
+     MethodEntry(category=<class 'sage.categories.additive_magmas.AdditiveMagmas.AdditiveUnital'>,
+                 nested_class='ParentMethods', name='zero', semantic={...}))
+    sage: index.categories_by_gap("IsAssociative")
+    (<class 'sage.categories.semigroups.Semigroups'>,)
+    sage: index.categories_by_gap_negation("IsFinite")
+    (<class 'sage.categories.sets_cat.Sets.Infinite'>,)
+    sage: index.categories_by_gap("NotAFilter")
+    ()
+
+The index is cached until the annotated categories change::
+
+    sage: semantic_index() is index
+    True
+"""
+
+import collections
+import sage.misc.sage_typing as sage_typing
+
+MethodEntry = collections.namedtuple("MethodEntry", ["category", "nested_class", "name", "semantic"])
+
+category_fields = ["mmt", "gap", "gap_sub", "gap_super", "gap_negation"]
+
+class SemanticIndex(object):
+    """
+    An index of the alignments of the given annotated categories
+
+    INPUT:
+
+    - ``categories`` -- an iterable of annotated category classes
+
+    All lookups are dictionary lookups, and return tuples (possibly
+    empty) as several categories or methods may share a name.
+    """
+    def __init__(self, categories):
+        categories = list(collections.OrderedDict.fromkeys(categories))
+        methods = {"gap": collections.defaultdict(list),
+                   "mmt": collections.defaultdict(list)}
+        for (cls, nested_class, name, semantic) in sage_typing.annotated_methods(categories):
+            entry = MethodEntry(cls, nested_class, name, semantic)
+            for field, index in methods.items():
+                key = semantic.get(field)
+                if key is not None:
+                    index[key].append(entry)
+        self._methods = {field: {key: tuple(entries) for key, entries in index.items()}
+                         for field, index in methods.items()}
+
+        self._categories = {field: collections.defaultdict(list) for field in category_fields}
+        for cls in categories:
+            semantic = cls.__dict__.get("_semantic", {})
+            for field, index in self._categories.items():
+                key = semantic.get(field)
+                if key is not None:
+                    index[key].append(cls)
+        self._categories = {field: {key: tuple(classes) for key, classes in index.items()}
+                            for field, index in self._categories.items()}
+
+    def methods_by_gap(self, name):
+        """
+        Return the annotated methods aligned with the GAP operation ``name``.
+
+        OUTPUT: a tuple of :class:`MethodEntry`
+        """
+        return self._methods["gap"].get(name, ())
+
+    def methods_by_mmt(self, name):
+        """
+        Return the annotated methods aligned with the MMT symbol ``name``.
+
+        OUTPUT: a tuple of :class:`MethodEntry`
+        """
+        return self._methods["mmt"].get(name, ())
+
+    def categories_by(self, field, name):
+        """
+        Return the category classes whose annotation ``field`` is ``name``.
+
+        INPUT:
+
+        - ``field`` -- one of ``"mmt"``, ``"gap"``, ``"gap_sub"``,
+          ``"gap_super"``, ``"gap_negation"``
+        - ``name`` -- a string
+
+        EXAMPLES::
+
+            sage: import sage_annotations
+            sage: from sage.misc.semantic_index import semantic_index
+            sage: semantic_index().categories_by("gap_sub", "IsList")
+            (<class 'sage.categories.finite_enumerated_sets.FiniteEnumeratedSets'>,)
+        """
+        return self._categories[field].get(name, ())
+
+    def categories_by_mmt(self, name):
+        return self._categories["mmt"].get(name, ())
+
+    def categories_by_gap(self, name):
+        return self._categories["gap"].get(name, ())
+
+    def categories_by_gap_sub(self, name):
+        return self._categories["gap_sub"].get(name, ())
+
+    def categories_by_gap_super(self, name):
+        return self._categories["gap_super"].get(name, ())
+
+    def categories_by_gap_negation(self, name):
+        return self._categories["gap_negation"].get(name, ())
+
+    def gap_filters(self):
+        """
+        Return the GAP filters occuring in the annotations of categories.
+
+        This includes the ``gap``, ``gap_sub``, ``gap_super`` and
+        ``gap_negation`` annotations.
+        """
+        return sorted(set(key for field in category_fields if field != "mmt"
+                          for key in self._categories[field]))
+
+# The index for the current annotated categories, if built
+_index = [None]
+
+def _invalidate_index(event, cls):
+    _index[0] = None
+
+sage_typing.annotated_categories.subscribe(_invalidate_index)
+
+def semantic_index():
+    """
+    Return the index of the alignments of all annotated categories.
+
+    The index is cached, and rebuilt upon the next call after the
+    annotated categories change.
+    """
+    if _index[0] is None:
+        _index[0] = SemanticIndex(sage_typing.annotated_categories)
+    return _index[0]
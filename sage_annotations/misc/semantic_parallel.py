@@ -0,0 +1,296 @@
+r"""
+Evaluating annotated methods on GAP objects in a pool of processes
+
+libgap is single threaded; to compute invariants of many GAP objects
+in parallel, :class:`GAPProcessPool` runs worker processes, each with
+its own libgap and with :mod:`sage_annotations` loaded.
+
+The GAP objects are shipped to the workers as descriptions from which
+they can be rebuilt: either a string of GAP code (e.g.
+``"SymmetricGroup(5)"``), or a pair ``(name, args)`` of a GAP function
+name and picklable arguments (e.g. ``("SymmetricGroup", (5,))``).
+
+In a worker, the Sage category of the GAP object is computed from
+its filters (see :mod:`sage.misc.semantic_resolver`); the annotated
+method is looked up in this category, its GAP alignment is called,
+and the result is converted according to the annotated codomain into
+plain Sage values that can be sent back (see :func:`transport`).
+
+Failures are reported per task, and do not interrupt the batch;
+this includes results that cannot be sent back. When a worker process
+dies, the pool is replaced: the chunks of tasks that had not started
+yet are run again in a new pool of the same size, while the tasks of
+the chunks that had started are retried once, one at a time in a
+single worker process, which is replaced whenever it dies. A task
+killing its worker thus only fails itself, and does not serialize the
+rest of the batch.
+
+EXAMPLES::
+
+    sage: import sage_annotations
+    sage: from sage.misc.semantic_parallel import GAPProcessPool
+    sage: with GAPProcessPool(processes=2) as pool:            # long time
+    ....:     results = pool.map("cardinality", ["SymmetricGroup({})".format(n) for n in range(1, 6)] + ["Foo"])
+    sage: [result.value for result in results]                  # long time
+    [1, 2, 6, 24, 120, None]
+    sage: "Variable: 'Foo' must have a value" in results[-1].error    # long time
+    True
+"""
+
+import collections
+import concurrent.futures
+import multiprocessing
+import pickle
+import traceback
+
+TaskResult = collections.namedtuple("TaskResult", ["description", "method", "value", "error"])
+
+def rebuild(description):
+    """
+    Return the GAP object described by ``description``.
+
+    EXAMPLES::
+
+        sage: from sage.misc.semantic_parallel import rebuild
+        sage: rebuild("CyclicGroup(3)")
+        <pc group of size 3 with 1 generator>
+        sage: rebuild(("CyclicGroup", (3,)))
+        <pc group of size 3 with 1 generator>
+    """
+    from sage.libs.gap.libgap import libgap
+    if isinstance(description, str):
+        return libgap.eval(description)
+    (name, args) = description
+    return libgap.function_factory(name)(*args)
+
+def transport(codomain, x):
+    """
+    Convert the GAP object ``x`` according to ``codomain`` into
+    values that can be sent to another process.
+
+    Containers (``List``, ``Family``, ``Facade``, ``Iterator``) are
+    converted into lists; their items, as well as other values, are
+    converted with ``.sage()`` if possible, and otherwise into their
+    GAP string representation.
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from sage.misc.semantic_parallel import transport
+        sage: from sage.misc.sage_typing import Facade, Self
+        sage: G = libgap.SymmetricGroup(3)
+        sage: transport(Facade[Facade[Self]], G.ConjugacyClasses())
+        [[()], [(1,2), (1,3), (2,3)], [(1,2,3), (1,3,2)]]
+    """
+    import sage.sets.family
+    from sage.libs.gap.libgap import libgap
+    from sage.misc.sage_typing import _Facade
+    from sage.misc.semantic_codegen import gap_iterator
+    origin = getattr(codomain, "__origin__", None)
+    args = getattr(codomain, "__args__", ())
+    if origin is not None and len(args) == 1:
+        if origin is _Facade:
+            return [transport(args[0], y) for y in libgap.AsList(x)]
+        if getattr(codomain, "_name", None) == "Iterator":
+            return [transport(args[0], y) for y in gap_iterator(x)]
+        if origin is list or origin is sage.sets.family.TrivialFamily:
+            return [transport(args[0], y) for y in x]
+    try:
+        return x.sage()
+    except (NotImplementedError, TypeError, ValueError):
+        return str(x)
+
+def evaluate(handle, name, args=()):
+    """
+    Evaluate the annotated parent method ``name`` on the GAP object ``handle``.
+
+    OUTPUT: the result, converted by :func:`transport`
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from sage.misc.semantic_parallel import evaluate
+        sage: evaluate(libgap.SymmetricGroup(4), "cardinality")
+        24
+    """
+    from sage.libs.gap.libgap import libgap
+    from sage.misc.semantic_batch import gap_semantic
+    from sage.misc.semantic_resolver import gap_category_resolver
+    (category, parent_class) = gap_category_resolver().resolve(handle)
+    semantic = gap_semantic(category, name)
+    f = libgap.function_factory(semantic["gap"])
+    result = f(handle, *[libgap(arg) for arg in args])
+    return transport(semantic.get("codomain"), result)
+
+def _initialize_worker():
+    import sage.all
+    import sage_annotations
+    sage.all, sage_annotations
+
+def _run(tasks, chunk=None, started=None):
+    """
+    Run a chunk of tasks in a worker, catching failures.
+
+    INPUT:
+
+    - ``tasks`` -- a list of triples ``(description, name, args)``
+    - ``chunk`` -- the index of the chunk
+    - ``started`` -- a shared dictionary (default: ``None``), in
+      which the chunk is marked as started
+
+    Results that cannot be pickled, and thus sent back, are reported
+    as failures.
+    """
+    if started is not None:
+        started[chunk] = True
+    results = []
+    for (description, name, args) in tasks:
+        try:
+            value = evaluate(rebuild(description), name, args)
+            pickle.dumps(value)
+        except Exception:
+            results.append(TaskResult(description, name, None, traceback.format_exc()))
+        else:
+            results.append(TaskResult(description, name, value, None))
+    return results
+
+class GAPProcessPool(object):
+    """
+    A pool of processes evaluating annotated methods on GAP objects
+
+    INPUT:
+
+    - ``processes`` -- an integer (default: the number of CPUs)
+    - ``chunksize`` -- an integer (default: 1): the number of tasks
+      sent at once to a worker
+
+    The workers are started with the ``spawn`` method, since forking
+    a process with a running libgap is not safe.
+    """
+    def __init__(self, processes=None, chunksize=1):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.chunksize = chunksize
+        self._executor = None
+        self._manager = None
+
+    def _new_executor(self, processes):
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initialize_worker)
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = self._new_executor(self.processes)
+        return self._executor
+
+    def _started(self):
+        """
+        Return a new dictionary shared with the workers, in which they
+        mark the chunks they start.
+        """
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager.dict()
+
+    def close(self):
+        """
+        Shut down the worker processes.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run_chunks(self, chunks):
+        """
+        Run the chunks of tasks.
+
+        OUTPUT: a triple ``(results, crashed, pending)`` of the
+        results, the chunks that were running when a worker died, and
+        the chunks that had not started then
+        """
+        pool = self._pool()
+        started = self._started()
+        futures = [(k, chunk, pool.submit(_run, [task for (i, task) in chunk], k, started))
+                   for (k, chunk) in enumerate(chunks)]
+        results = {}
+        crashed = []
+        pending = []
+        for (k, chunk, future) in futures:
+            try:
+                for (i, result) in zip([i for (i, task) in chunk], future.result()):
+                    results[i] = result
+            except concurrent.futures.process.BrokenProcessPool:
+                (crashed if k in started else pending).append(chunk)
+            except Exception:
+                error = traceback.format_exc()
+                for (i, (description, name, args)) in chunk:
+                    results[i] = TaskResult(description, name, None, error)
+        if crashed or pending:
+            # The pool can't be reused
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if pending and not crashed:
+            # The workers died before starting any chunk; nothing
+            # tells these apart, so they are all isolated
+            (crashed, pending) = (pending, [])
+        return results, crashed, pending
+
+    def _retry(self, tasks):
+        """
+        Run the tasks one at a time in a single worker process,
+        replaced whenever it dies; return the results.
+        """
+        results = {}
+        executor = None
+        try:
+            for (i, task) in tasks:
+                if executor is None:
+                    executor = self._new_executor(1)
+                try:
+                    results[i] = executor.submit(_run, [task]).result()[0]
+                except concurrent.futures.process.BrokenProcessPool:
+                    executor.shutdown(wait=False)
+                    executor = None
+                    (description, name, args) = task
+                    results[i] = TaskResult(description, name, None, "the worker process died")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return results
+
+    def map(self, name, descriptions, *args):
+        """
+        Evaluate the annotated method ``name`` on the GAP objects described by ``descriptions``.
+
+        INPUT:
+
+        - ``name`` -- the name of an annotated parent method with a GAP alignment
+        - ``descriptions`` -- an iterable of descriptions of GAP objects
+          (see :func:`rebuild`)
+        - ``args`` -- further (picklable) arguments for the method
+
+        OUTPUT: a list of :class:`TaskResult`, in the order of ``descriptions``
+        """
+        tasks = [(i, (description, name, args)) for (i, description) in enumerate(descriptions)]
+        chunks = [tasks[i:i+self.chunksize] for i in range(0, len(tasks), self.chunksize)]
+        results = {}
+        crashed = []
+        # Each round with a dead worker leaves at least one crashed chunk
+        while chunks:
+            (round_results, round_crashed, chunks) = self._run_chunks(chunks)
+            results.update(round_results)
+            crashed.extend(round_crashed)
+        # Retry once the tasks of the chunks running in dead workers, in isolation
+        if crashed:
+            results.update(self._retry([task for chunk in crashed for task in chunk]))
+        return [results[i] for i in range(len(tasks))]
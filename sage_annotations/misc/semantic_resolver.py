@@ -0,0 +1,200 @@
+r"""
+Resolving the GAP filters of an object into a Sage category
+
+The category level annotations (``gap``, ``gap_sub``,
+``gap_negation``) describe which GAP filters imply which Sage
+categories. The resolver below uses them to compute, from the filters
+of a GAP object, the most specific Sage category it belongs to.
+
+The set of filters is first encoded as a bitset (an integer)
+against the annotated filters: objects with the same signature
+resolve to the same category, and the category and its parent class
+are cached by signature.
+
+A category annotated with ``gap_negation="F"`` is selected when the
+filter ``F`` is known to be false, that is ``HasF`` is in the filters,
+but not ``F``.
+
+EXAMPLES::
+
+    sage: import sage_annotations
+    sage: from sage.misc.semantic_resolver import gap_category_resolver
+    sage: resolver = gap_category_resolver()
+    sage: resolver.category(["IsMagma", "IsAssociative", "IsMagmaWithOne", "IsFinite"])
+    Category of finite monoids
+    sage: resolver.category(["IsMagma", "IsAssociative", "HasIsFinite"])
+    Category of infinite semigroups
+    sage: s = resolver.signature(["IsMagma", "IsAssociative", "IsCollection"])
+    sage: s == resolver.signature(["IsAssociative", "IsMagma"])
+    True
+    sage: resolver.parent_class(s)
+    <class 'sage.categories.semigroups.Semigroups.parent_class'>
+
+From an actual GAP object::
+
+    sage: G = libgap.SymmetricGroup(3)
+    sage: resolver.resolve(G)
+    (Category of finite groups, <class 'sage.categories.finite_groups.FiniteGroups.parent_class'>)
+"""
+
+from sage.categories.category import Category
+from sage.categories.category_types import Category_over_base_ring
+from sage.categories.category_with_axiom import CategoryWithAxiom
+from sage.misc.semantic_index import semantic_index
+
+def gap_filters(handle):
+    """
+    Return the names of the filters of the GAP object ``handle``.
+
+    This consists of its categories, its known true properties, and
+    ``HasP`` for each of its known properties ``P``.
+
+    EXAMPLES::
+
+        sage: from sage.misc.semantic_resolver import gap_filters
+        sage: filters = gap_filters(libgap.SymmetricGroup(3))
+        sage: "IsMagmaWithInverses" in filters, "IsFinite" in filters, "HasIsFinite" in filters
+        (True, True, True)
+    """
+    from sage.libs.gap.libgap import libgap
+    filters = set(libgap.CategoriesOfObject(handle).sage())
+    filters.update(libgap.KnownTruePropertiesOfObject(handle).sage())
+    filters.update("Has" + name for name in libgap.KnownPropertiesOfObject(handle).sage())
+    return frozenset(filters)
+
+def category_instance(cls, base_ring=None):
+    """
+    Return the instance of the category class ``cls``.
+
+    INPUT:
+
+    - ``cls`` -- a category class
+    - ``base_ring`` -- a ring (default: ``None``), for the categories
+      over a base ring; if ``None``, their default instance is used
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from sage.misc.semantic_resolver import category_instance
+        sage: from sage.categories.finite_semigroups import FiniteSemigroups
+        sage: category_instance(FiniteSemigroups)
+        Category of finite semigroups
+        sage: category_instance(LieAlgebras, QQ)
+        Category of Lie algebras over Rational Field
+    """
+    if issubclass(cls, CategoryWithAxiom):
+        base_cls, axiom = cls._base_category_class_and_axiom
+        return category_instance(base_cls, base_ring)._with_axiom(axiom)
+    if issubclass(cls, Category_over_base_ring):
+        if base_ring is None:
+            return cls.an_instance()
+        return cls(base_ring)
+    return cls.an_instance()
+
+class GAPCategoryResolver(object):
+    """
+    A resolver of sets of GAP filters into Sage categories
+
+    INPUT:
+
+    - ``index`` -- a :class:`~sage.misc.semantic_index.SemanticIndex`
+    """
+    def __init__(self, index):
+        # Positive filter -> bit; negated filter -> bit
+        self._bits = {}
+        self._negation_bits = {}
+        # Bitmasks selecting each annotated category
+        masks = {}
+        for field in ["gap", "gap_sub"]:
+            for name in index.gap_filters():
+                for cls in index.categories_by(field, name):
+                    bit = self._bits.setdefault(name, 1 << (len(self._bits) + len(self._negation_bits)))
+                    masks[cls] = masks.get(cls, 0) | bit
+        for name in index.gap_filters():
+            for cls in index.categories_by_gap_negation(name):
+                bit = self._negation_bits.setdefault(name, 1 << (len(self._bits) + len(self._negation_bits)))
+                masks[cls] = masks.get(cls, 0) | bit
+        self._masks = list(masks.items())
+        # (signature, base_ring, axioms) -> (category, parent class)
+        self._cache = {}
+
+    def signature(self, filters):
+        """
+        Return the bitset encoding the annotated filters among ``filters``.
+
+        INPUT:
+
+        - ``filters`` -- an iterable of names of GAP filters
+        """
+        if not isinstance(filters, (set, frozenset)):
+            filters = frozenset(filters)
+        bits = self._bits
+        signature = 0
+        for name in filters:
+            bit = bits.get(name)
+            if bit is not None:
+                signature |= bit
+        for name, bit in self._negation_bits.items():
+            if name not in filters and "Has" + name in filters:
+                signature |= bit
+        return signature
+
+    def _resolve(self, signature, base_ring=None, axioms=()):
+        key = (signature, base_ring, axioms)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        categories = [category_instance(cls, base_ring)
+                      for (cls, mask) in self._masks if signature & mask]
+        category = Category.join(categories, axioms=axioms)
+        result = self._cache[key] = (category, category.parent_class)
+        return result
+
+    def category(self, filters, base_ring=None, axioms=()):
+        """
+        Return the most specific Sage category implied by the filters.
+
+        INPUT:
+
+        - ``filters`` -- an iterable of names of GAP filters, or a
+          signature as returned by :meth:`signature`
+        - ``base_ring`` -- a ring (default: ``None``), for the
+          categories over a base ring; if ``None``, the default
+          instance of these categories is used
+        - ``axioms`` -- a tuple of axioms to be added to the category
+          (e.g. ``("GAP",)``)
+        """
+        if not isinstance(filters, int):
+            filters = self.signature(filters)
+        return self._resolve(filters, base_ring, tuple(axioms))[0]
+
+    def parent_class(self, filters, base_ring=None, axioms=()):
+        """
+        Return the parent class of :meth:`category`.
+        """
+        if not isinstance(filters, int):
+            filters = self.signature(filters)
+        return self._resolve(filters, base_ring, tuple(axioms))[1]
+
+    def resolve(self, handle, base_ring=None, axioms=()):
+        """
+        Return the category and parent class for the GAP object ``handle``.
+        """
+        return self._resolve(self.signature(gap_filters(handle)), base_ring, tuple(axioms))
+
+# The resolver for the current index
+_resolver = [None, None]
+
+def gap_category_resolver():
+    """
+    Return the resolver for the current annotations.
+
+    It is rebuilt (and its cache cleared) whenever the annotated
+    categories change.
+    """
+    index = semantic_index()
+    if _resolver[0] is not index:
+        _resolver[1] = GAPCategoryResolver(index)
+        _resolver[0] = index
+    return _resolver[1]
@@ -0,0 +1,273 @@
+r"""
+Adaptive routing between Sage and GAP implementations
+
+Many annotated methods have both a native Sage implementation (e.g.
+``FiniteGroups.ParentMethods.cardinality``) and a GAP alignment
+(``Size``). For parents that are handles to GAP objects, either can
+be used. :func:`adaptive_routing` replaces such methods, in the parent
+class of a category, by a dispatcher which measures the latency of
+each backend and routes the calls to the fastest one.
+
+The policy, implemented by :class:`Router`, is as follows:
+
+- each backend is first tried :attr:`Router.samples` times;
+- then calls go to the backend with the smallest average latency
+  (exponentially weighted); every :attr:`Router.explore_every` calls,
+  the other backend is tried again to refresh its measure;
+- a backend whose last call took longer than
+  :attr:`Router.exploration_limit` is not explored anymore; it is
+  only used if the other backend is not available. Calls are never
+  interrupted: this only bounds the time lost in exploration;
+- when a backend raises ``NotImplementedError``, the call is
+  retried with the other backend. A backend raising it on
+  :attr:`Router.samples` consecutive calls, for parents of the same
+  class, is disabled for that class until :meth:`Router.reset`; a
+  backend which is only unavailable for some parents of a class thus
+  remains in use for the others;
+- calls with keyword arguments always go to the Sage implementation,
+  since the generated GAP implementations only take positional
+  arguments;
+- :attr:`Router.force` (or :meth:`Router.override` for a single
+  method) bypasses the measures.
+
+EXAMPLES::
+
+    sage: import sage_annotations
+    sage: from mygap import mygap
+    sage: from sage.misc.semantic_routing import adaptive_routing, router
+    sage: G = mygap.SymmetricGroup(4)
+    sage: adaptive_routing(G.category(), ["cardinality"])
+    ['cardinality']
+    sage: [G.cardinality() for i in range(10)]
+    [24, 24, 24, 24, 24, 24, 24, 24, 24, 24]
+    sage: timings = router.timings()
+    sage: sorted(timings[type(G), "cardinality"])
+    ['gap', 'sage']
+    sage: router.override("cardinality", "gap")
+    sage: G.cardinality()
+    24
+    sage: router.override("cardinality", None)
+"""
+
+import time
+import functools
+from sage.misc.abstract_method import AbstractMethod
+
+backends = ("sage", "gap")
+
+class BackendStatistics(object):
+    """
+    The measured latency of a backend for a method of a parent class
+    """
+    __slots__ = ("calls", "mean", "last", "failures", "disabled")
+
+    def __init__(self):
+        self.calls = 0
+        self.mean = None
+        self.last = None
+        self.failures = 0
+        self.disabled = False
+
+    def record(self, duration, smoothing):
+        self.calls += 1
+        self.failures = 0
+        self.last = duration
+        if self.mean is None:
+            self.mean = duration
+        else:
+            self.mean += smoothing * (duration - self.mean)
+
+    def as_dict(self):
+        return {"calls": self.calls, "mean": self.mean, "last": self.last,
+                "failures": self.failures, "disabled": self.disabled}
+
+class Router(object):
+    """
+    The routing policy and the latency measures
+
+    INPUT:
+
+    - ``exploration_limit`` -- a number of seconds (default: 1): a
+      backend whose last call took longer is not explored anymore
+    - ``samples`` -- an integer (default: 3): the number of calls to
+      each backend before routing on measures
+    - ``explore_every`` -- an integer (default: 100): how often the
+      slower backend is measured again
+    - ``smoothing`` -- a number in `(0,1]` (default: 0.2): the weight
+      of the last measure in the average latency
+    """
+    def __init__(self, exploration_limit=1.0, samples=3, explore_every=100, smoothing=0.2):
+        self.exploration_limit = exploration_limit
+        self.samples = samples
+        self.explore_every = explore_every
+        self.smoothing = smoothing
+        self.force = None
+        self._overrides = {}
+        # (parent class, method name) -> {backend: BackendStatistics}
+        self._statistics = {}
+
+    def override(self, name, backend):
+        """
+        Route all calls to the method ``name`` to ``backend``.
+
+        INPUT:
+
+        - ``name`` -- a method name
+        - ``backend`` -- ``"sage"``, ``"gap"``, or ``None`` to
+          restore adaptive routing
+        """
+        if backend is None:
+            self._overrides.pop(name, None)
+        else:
+            if backend not in backends:
+                raise ValueError("backend should be one of {}".format(backends))
+            self._overrides[name] = backend
+
+    def statistics(self, key):
+        try:
+            return self._statistics[key]
+        except KeyError:
+            result = self._statistics[key] = {backend: BackendStatistics() for backend in backends}
+            return result
+
+    def choose(self, key, statistics, exclude=()):
+        """
+        Return the backend to use for the next call.
+
+        The backends in ``exclude`` are not considered, unless a
+        backend is forced.
+        """
+        forced = self._overrides.get(key[1], self.force)
+        if forced is not None:
+            return forced
+        available = [backend for backend in backends
+                     if not statistics[backend].disabled and backend not in exclude]
+        if len(available) == 1:
+            return available[0]
+        explorable = [backend for backend in available
+                      if statistics[backend].last is None or statistics[backend].last <= self.exploration_limit]
+        if not explorable:
+            explorable = available
+        for backend in explorable:
+            if statistics[backend].calls < self.samples:
+                return backend
+        best = min(available, key=lambda backend: statistics[backend].mean)
+        calls = sum(statistics[backend].calls for backend in available)
+        if calls % self.explore_every == 0:
+            others = [backend for backend in explorable if backend != best]
+            if others:
+                return others[0]
+        return best
+
+    def call(self, key, implementations, parent, args):
+        """
+        Call the method ``key`` on ``parent``, choosing the backend.
+
+        A backend raising ``NotImplementedError`` is excluded for the
+        rest of this call only, unless it reaches :attr:`samples`
+        consecutive failures, in which case it gets disabled for the
+        parent class.
+        """
+        statistics = self.statistics(key)
+        failed = []
+        while True:
+            backend = self.choose(key, statistics, exclude=failed)
+            start = time.perf_counter()
+            try:
+                result = implementations[backend](parent, *args)
+            except NotImplementedError:
+                # Only fall back when there is another backend to try
+                other = [b for b in backends
+                         if b != backend and b not in failed and not statistics[b].disabled]
+                if not other or self._overrides.get(key[1], self.force) is not None:
+                    raise
+                failed.append(backend)
+                statistics[backend].failures += 1
+                if statistics[backend].failures >= self.samples:
+                    statistics[backend].disabled = True
+                continue
+            statistics[backend].record(time.perf_counter() - start, self.smoothing)
+            return result
+
+    def timings(self):
+        """
+        Return the measures, as a dictionary ``(parent class, method
+        name) -> backend -> measures``.
+
+        Parent classes are not keyed by name, since distinct classes
+        (e.g. the parent classes of two categories with axioms) may
+        share their names.
+        """
+        return {key: {backend: s.as_dict() for backend, s in statistics.items()}
+                for key, statistics in self._statistics.items()}
+
+    def reset(self):
+        """
+        Forget all measures, and enable again the disabled backends.
+        """
+        self._statistics.clear()
+
+router = Router()
+
+def adaptive_method(name, sage_implementation, gap_implementation, router=router):
+    """
+    Return a method routing its calls between the two implementations.
+
+    Calls with keyword arguments are not routed: they go to
+    ``sage_implementation``, and are not measured.
+    """
+    implementations = {"sage": sage_implementation, "gap": gap_implementation}
+    call = router.call
+    @functools.wraps(sage_implementation)
+    def method(self, *args, **kwds):
+        if kwds:
+            return sage_implementation(self, *args, **kwds)
+        return call((type(self), name), implementations, self, args)
+    method.__adaptive_implementations__ = implementations
+    return method
+
+def adaptive_routing(category, names=None, router=router):
+    """
+    Install adaptive routing in the parent class of ``category``.
+
+    INPUT:
+
+    - ``category`` -- a category whose parents are handles to GAP objects
+    - ``names`` -- a list of method names (default: all annotated
+      parent methods of ``category``)
+
+    A method gets routed if it is annotated with a GAP name for which
+    :func:`~sage.misc.semantic_codegen.generate_method` produces an
+    implementation, and it has a concrete Sage implementation in the
+    parent class.
+
+    OUTPUT: the list of the names of the routed methods
+    """
+    from sage.misc.semantic_codegen import generate_method
+    from sage.misc.semantic_hooks import method_category_name
+    parent_class = category.parent_class
+    semantic = category.collect_semantic()["parents"]
+    if names is None:
+        names = sorted(semantic)
+    routed = []
+    for name in names:
+        if name not in semantic:
+            continue
+        implementation = None
+        for cls in parent_class.__mro__:
+            if name in cls.__dict__:
+                implementation = cls.__dict__[name]
+                break
+        if (implementation is None or isinstance(implementation, AbstractMethod) or
+            not callable(implementation) or
+            hasattr(implementation, "__source__") or
+            hasattr(implementation, "__generate__") or
+            hasattr(implementation, "__adaptive_implementations__")):
+            continue
+        gap_implementation = generate_method(name, semantic[name], "parent",
+                                             category=method_category_name(category, name))
+        if gap_implementation is None:
+            continue
+        setattr(parent_class, name, adaptive_method(name, implementation, gap_implementation, router))
+        routed.append(name)
+    return routed
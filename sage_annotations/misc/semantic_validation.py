@@ -0,0 +1,282 @@
+r"""
+Validation of the results of annotated methods against their codomain
+
+When enabled, :data:`validation` checks the results of the GAP backed
+implementations of annotated methods (see
+:mod:`sage.misc.semantic_codegen`) and of batched calls (see
+:mod:`sage.misc.semantic_batch`) against their annotated codomains.
+It goes through the same switch as the instrumentation (see
+:mod:`sage.misc.semantic_hooks`), so that it costs nothing when
+disabled.
+
+Each codomain is compiled once (per context) into a checker function
+(see :func:`checker`), the dependent types (``Self``,
+``ParentOfSelf``, ``FacadeFor``) being specialized by the checker
+from the object the method was called on. The checker of a method is
+looked up once per type of object it is called on. Containers of more
+than :attr:`Validation.threshold` items are checked on a random
+sample of :attr:`Validation.sample_size` items; containers whose
+items are not checked are not asked for their length, which may
+require a call to GAP. Iterators are not consumed.
+
+Failures are counted, and either reported as a
+:class:`CodomainWarning` or raised as a :class:`CodomainError`.
+Exceptions raised by the checks themselves are not failures: they
+are counted as errors, and either reported as a
+:class:`CodomainWarning` or propagated.
+
+EXAMPLES::
+
+    sage: import sage_annotations
+    sage: from mygap import mygap
+    sage: from sage.misc.semantic_validation import validation
+    sage: validation.enable(mode="raise")
+    sage: G = mygap.SymmetricGroup(3)
+    sage: len(G.conjugacy_classes())
+    3
+    sage: validation.statistics()
+    {'checked': 1, 'errors': 0, 'failures': 0, 'failures_by_method': {}}
+    sage: validation.disable()
+"""
+
+import collections
+import itertools
+import random
+import warnings
+
+from sage.misc.sage_typing import DependentType, Sage, _Facade, type_repr
+from sage.misc.semantic_codegen import _parents
+from sage.misc.semantic_hooks import hooks
+import sage.sets.family
+from sage.structure.parent import Parent
+
+class CodomainError(TypeError):
+    """
+    Raised when the result of an annotated method is not in its codomain.
+    """
+
+class CodomainWarning(UserWarning):
+    """
+    Issued when the result of an annotated method is not in its codomain.
+    """
+
+class Validation(object):
+    """
+    The settings and counters of the validation
+
+    - :attr:`mode` -- ``"warn"`` or ``"raise"``
+    - :attr:`threshold` -- the size above which containers are sampled
+    - :attr:`sample_size` -- the number of items checked in a sampled container
+    """
+    def __init__(self):
+        self.mode = "warn"
+        self.threshold = 64
+        self.sample_size = 8
+        self.random = random.Random()
+        self.checked = 0
+        self.failures = 0
+        self.errors = 0
+        self.failures_by_method = collections.Counter()
+        # (method key, type of the object) -> checker
+        self._checkers = {}
+
+    def enable(self, mode="warn"):
+        """
+        Start validating the results, and report failures according to ``mode``.
+        """
+        if mode not in ("warn", "raise"):
+            raise ValueError("mode should be 'warn' or 'raise'")
+        self.mode = mode
+        hooks.set_validator(self)
+
+    def disable(self):
+        """
+        Stop validating the results.
+        """
+        if hooks.validator is self:
+            hooks.set_validator(None)
+
+    def __call__(self, key, obj, codomain, result):
+        """
+        Validate the result ``result`` of the method ``key`` called on ``obj``.
+        """
+        try:
+            check = self._checkers[key, type(obj)]
+        except KeyError:
+            check = checker(codomain, "parent" if isinstance(obj, Parent) else "element")
+            self._checkers[key, type(obj)] = check
+        if check is None:
+            return
+        self.checked += 1
+        try:
+            valid = check(obj, result)
+        except Exception as e:
+            self.errors += 1
+            if self.mode == "raise":
+                raise
+            warnings.warn("checking the result of {} of {} raised {}: {}".format(
+                key[1], key[0], type(e).__name__, e), CodomainWarning)
+            return
+        if valid:
+            return
+        self.failures += 1
+        self.failures_by_method[key] += 1
+        message = "{} of {} returned {} object, which is not of type {}".format(
+            key[1], key[0], type(result).__name__, type_repr(codomain))
+        if self.mode == "raise":
+            raise CodomainError(message)
+        warnings.warn(message, CodomainWarning)
+
+    def statistics(self):
+        """
+        Return the number of checked results, of failures, and of
+        errors raised by the checks.
+        """
+        return {"checked": self.checked, "errors": self.errors, "failures": self.failures,
+                "failures_by_method": dict(self.failures_by_method)}
+
+    def reset(self):
+        """
+        Reset the counters.
+        """
+        self.checked = 0
+        self.failures = 0
+        self.errors = 0
+        self.failures_by_method.clear()
+
+validation = Validation()
+
+def _sample(container, check):
+    """
+    Return whether ``container`` is iterable and ``check`` holds for
+    its items, or for a random sample of them if it is large.
+
+    If ``check`` is ``None``, the length of ``container`` is not
+    computed.
+    """
+    if check is None:
+        return hasattr(container, "__iter__")
+    if not hasattr(container, "__len__"):
+        return False
+    n = len(container)
+    if n <= validation.threshold:
+        items = container
+    else:
+        try:
+            items = [container[i] for i in validation.random.sample(range(n), min(n, validation.sample_size))]
+        except (TypeError, KeyError, NotImplementedError):
+            items = itertools.islice(container, validation.sample_size)
+    return all(check(x) for x in items)
+
+def _is_gap(x):
+    from sage.libs.gap.element import GapElement
+    return isinstance(x, GapElement)
+
+# The code computing the parents a facade is for, depending on
+# whether self is a parent or an element
+_facades = {
+    "parent": "self.facade_for()",
+    "element": "self.parent().facade_for()",
+}
+
+def check_code(codomain, var, context, depth=0):
+    """
+    Return the code checking that ``var`` is in ``codomain``.
+
+    INPUT: as for :func:`~sage.misc.semantic_codegen.conversion_code`
+
+    OUTPUT: a string, or ``None`` if nothing can be checked
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from sage.misc.semantic_validation import check_code
+        sage: from sage.misc.sage_typing import Facade, List, ParentOfSelf, Self
+        sage: check_code(List[Self], "x", "parent")
+        'isinstance(x, (list, tuple)) and _sample(x, lambda x0: parent(x0) is self)'
+        sage: check_code(Facade[Facade[ParentOfSelf]], "x", "element")
+        '_sample(x, lambda x0: _sample(x0, lambda x1: parent(x1) is self.parent()))'
+    """
+    if codomain is bool:
+        return "isinstance({}, bool)".format(var)
+    if codomain is Sage:
+        return "not _is_gap({})".format(var)
+    if isinstance(codomain, DependentType):
+        if codomain.name == "FacadeFor":
+            return "parent({}) in {}".format(var, _facades[context])
+        expected = _parents.get((context, codomain.name))
+        if expected is None:
+            return None
+        return "parent({}) is {}".format(var, expected)
+    origin = getattr(codomain, "__origin__", None)
+    if origin is None:
+        return None
+    args = getattr(codomain, "__args__", ())
+    inner_var = "x{}".format(depth)
+    inner = check_code(args[0], inner_var, context, depth+1) if len(args) == 1 else None
+    item_check = "None" if inner is None else "lambda {}: {}".format(inner_var, inner)
+    if origin is list:
+        return "isinstance({0}, (list, tuple)) and _sample({0}, {1})".format(var, item_check)
+    if origin is sage.sets.family.TrivialFamily:
+        return "isinstance({0}, AbstractFamily) and _sample({0}, {1})".format(var, item_check)
+    if origin is _Facade:
+        return "_sample({}, {})".format(var, item_check)
+    if getattr(codomain, "_name", None) == "Iterator":
+        return "hasattr({}, '__next__')".format(var)
+    return None
+
+# (codomain, context) -> checker
+_checkers = {}
+
+def checker(codomain, context="parent"):
+    """
+    Return a function ``(self, x) -> bool`` checking that ``x`` is in
+    ``codomain``, as specialized for ``self``.
+
+    INPUT:
+
+    - ``codomain`` -- a type
+    - ``context`` -- ``"parent"`` or ``"element"`` (default:
+      ``"parent"``): whether ``self`` is a parent or an element
+
+    OUTPUT: a function, or ``None`` if nothing can be checked
+
+    The functions are compiled once per codomain and context.
+
+    EXAMPLES::
+
+        sage: import sage_annotations
+        sage: from sage.misc.semantic_validation import checker
+        sage: from sage.misc.sage_typing import Family, List, Self
+        sage: S = Semigroups().example()
+        sage: check = checker(List[Self])
+        sage: check(S, [S('a'), S('b')])
+        True
+        sage: check(S, ['a', 'b'])
+        False
+        sage: check(S, S.semigroup_generators())
+        False
+        sage: checker(Family[Self])(S, S.semigroup_generators())
+        True
+        sage: checker(List[Self]) is check
+        True
+    """
+    key = (codomain, context)
+    try:
+        return _checkers[key]
+    except KeyError:
+        pass
+    code = check_code(codomain, "x", context)
+    if code is None:
+        f = None
+    else:
+        from sage.sets.family import AbstractFamily
+        from sage.structure.element import parent
+        namespace = {"_sample": _sample, "_is_gap": _is_gap,
+                     "AbstractFamily": AbstractFamily, "parent": parent}
+        exec(compile("def check(self, x):\n    return {}\n".format(code),
+                     "<generated check of {}>".format(type_repr(codomain)), "exec"),
+             namespace)
+        f = namespace["check"]
+    _checkers[key] = f
+    return f
@@ -0,0 +1,242 @@
+r"""
+Structure constants of finite dimensional Lie algebras as NumPy tensors
+
+:class:`StructureConstants` holds the structure constants of a Lie
+algebra with basis `(b_1, \dots, b_n)` as a tensor `C` of shape
+`(n, n, n)`, where `C[i, j, k]` is the coefficient of `b_k` in
+`[b_i, b_j]`. Brackets and adjoint matrices of elements given by
+their coordinate vectors are then computed by NumPy, with no call to
+GAP, and brackets of many pairs of elements at once.
+
+The tensor is extracted from GAP's ``StructureConstantsTable`` with
+a single call and a single conversion (see
+:meth:`StructureConstants.from_gap_basis`). It is stored flattened as
+a matrix of shape `(n, n^2)`, either dense, or sparse with SciPy.
+
+EXAMPLES::
+
+    sage: from sage.misc.structure_constants import StructureConstants
+    sage: from sage.libs.gap.libgap import libgap
+    sage: L = libgap.SimpleLieAlgebra("A", 1, libgap.Rationals)
+    sage: C = StructureConstants.from_gap_basis(libgap.Basis(L)); C
+    Structure constants of a Lie algebra of dimension 3 (dense, int64)
+    sage: C.bracket([1, 0, 0], [0, 1, 0])
+    array([0, 0, 1])
+    sage: C.adjoint_matrix([0, 0, 1])
+    array([[ 2,  0,  0],
+           [ 0, -2,  0],
+           [ 0,  0,  0]])
+    sage: C.brackets([[1, 0, 0], [0, 0, 1]], [[0, 1, 0], [1, 0, 0]])
+    array([[0, 0, 1],
+           [2, 0, 0]])
+
+Machine integers are only used when the results are known to fit in
+them; otherwise the computation is done with Python integers::
+
+    sage: C.bracket([2^40, 0, 0], [0, 2^40, 0])
+    array([0, 0, 1208925819614629174706176], dtype=object)
+"""
+
+def _maximum(X):
+    """
+    Return the largest absolute value of the entries of the integer
+    array, or sparse matrix, ``X`` as a Python integer, or ``0`` for
+    other arrays.
+    """
+    if X.size == 0 or X.dtype.kind not in "biu":
+        return 0
+    return max(abs(int(X.max())), abs(int(X.min())))
+
+
+def _may_overflow(factor, X):
+    """
+    Return whether sums of products of ``factor`` by entries of ``X`` may overflow ``int64``.
+    """
+    import numpy
+    return X.dtype.kind in "biu" and factor * _maximum(X) > numpy.iinfo(numpy.int64).max
+
+
+class StructureConstants(object):
+    """
+    The structure constants of a Lie algebra of dimension `n`
+
+    INPUT:
+
+    - ``matrix`` -- a NumPy array, or a SciPy sparse matrix, of shape
+      `(n, n^2)`, whose entry `(i, jn+k)` is the coefficient of `b_k`
+      in `[b_i, b_j]`
+    - ``basis`` -- the GAP basis the constants are with respect to, or
+      ``None``
+
+    Coordinate vectors and batches of them can be given as NumPy
+    arrays or lists; the results are NumPy arrays, of ``object`` data
+    type when either the constants or the coordinates are not
+    machine numbers, or when the integer results may not fit in
+    ``int64``.
+    """
+    def __init__(self, matrix, basis=None):
+        self.dimension = matrix.shape[0]
+        self._matrix = matrix
+        self._object_matrix = None
+        self._maximum = None
+        self.basis = basis
+
+    @classmethod
+    def from_gap_basis(cls, basis, sparse=False, dtype=None):
+        """
+        Return the structure constants of a Lie algebra with respect to a GAP basis.
+
+        INPUT:
+
+        - ``basis`` -- a GAP basis of a Lie algebra
+        - ``sparse`` -- a boolean (default: ``False``): whether to
+          store the constants in a SciPy sparse matrix
+        - ``dtype`` -- a NumPy data type (default: ``int64`` if all
+          the constants are integers fitting in it, and ``object``
+          otherwise)
+
+        Sparse matrices can not hold ``object`` entries.
+        """
+        import numpy
+        from sage.libs.gap.libgap import libgap
+        from sage.rings.integer import Integer
+        # The table holds, for each i and j, the pair of the lists of
+        # the (1-based) indices and of the coefficients of [b_i, b_j],
+        # followed by the symmetry flag and the zero
+        table = libgap.StructureConstantsTable(basis).sage()
+        n = len(table) - 2
+        rows = []
+        columns = []
+        data = []
+        for i in range(n):
+            for j in range(n):
+                (indices, coefficients) = table[i][j]
+                for (k, c) in zip(indices, coefficients):
+                    rows.append(i)
+                    columns.append(j * n + int(k) - 1)
+                    data.append(c)
+        if dtype is None:
+            bound = numpy.iinfo(numpy.int64).max
+            if all(type(c) is Integer and -bound <= c <= bound for c in data):
+                dtype = numpy.int64
+            else:
+                dtype = object
+        if sparse:
+            if dtype is object:
+                raise ValueError("sparse structure constants need a numeric data type")
+            from scipy.sparse import csr_matrix
+            matrix = csr_matrix((numpy.array(data, dtype=dtype), (rows, columns)), shape=(n, n * n))
+        else:
+            matrix = numpy.zeros((n, n * n), dtype=dtype)
+            for (i, jk, c) in zip(rows, columns, data):
+                matrix[i, jk] = c
+        return cls(matrix, basis=basis)
+
+    def __repr__(self):
+        return "Structure constants of a Lie algebra of dimension {} ({}, {})".format(
+            self.dimension, "dense" if self.is_dense() else "sparse", self._matrix.dtype)
+
+    def is_dense(self):
+        import numpy
+        return isinstance(self._matrix, numpy.ndarray)
+
+    def tensor(self):
+        """
+        Return the structure constants as a dense array of shape `(n, n, n)`.
+        """
+        matrix = self._matrix if self.is_dense() else self._matrix.toarray()
+        n = self.dimension
+        return matrix.reshape(n, n, n)
+
+    def _bound(self):
+        """
+        Return the largest absolute value of the constants, as a Python integer.
+        """
+        if self._maximum is None:
+            self._maximum = _maximum(self._matrix)
+        return self._maximum
+
+    def _products(self, X, factor=1):
+        """
+        Return the array of shape ``X.shape + (n,)`` whose entry
+        ``(..., j, k)`` is the coefficient of `b_k` in `[x, b_j]`.
+
+        The result is further multiplied and summed by the caller with
+        entries bounded by ``factor``; ``object`` arithmetic is used
+        when the outcome may overflow ``int64``.
+        """
+        import numpy
+        X = numpy.asarray(X)
+        matrix = self._matrix
+        if matrix.dtype != object and (X.dtype == object or
+                                       _may_overflow(self._bound() * self.dimension * factor, X)):
+            if self._object_matrix is None:
+                dense = matrix if self.is_dense() else matrix.toarray()
+                self._object_matrix = dense.astype(object)
+            matrix = self._object_matrix
+            X = X.astype(object)
+        n = self.dimension
+        return numpy.asarray(X @ matrix).reshape(X.shape[:-1] + (n, n))
+
+    def _bracket_products(self, X, Y):
+        """
+        Return ``Y`` and the products of ``X``, with a common data type.
+        """
+        import numpy
+        Y = numpy.asarray(Y)
+        P = self._products(X, self.dimension * _maximum(Y))
+        if P.dtype == object and Y.dtype != object:
+            Y = Y.astype(object)
+        return (Y, P)
+
+    def bracket(self, x, y):
+        """
+        Return the coordinates of `[x, y]`, given the coordinates of `x` and `y`.
+        """
+        (y, P) = self._bracket_products(x, y)
+        return y @ P
+
+    def brackets(self, X, Y):
+        """
+        Return the coordinates of the brackets of pairs of elements.
+
+        INPUT:
+
+        - ``X``, ``Y`` -- arrays of shape `(m, n)` holding the
+          coordinates of `m` elements each
+
+        OUTPUT: the array of shape `(m, n)` whose `i`-th row holds the
+        coordinates of `[X_i, Y_i]`
+        """
+        import numpy
+        (Y, P) = self._bracket_products(X, Y)
+        return numpy.matmul(Y[:, None, :], P)[:, 0, :]
+
+    def adjoint_matrix(self, x):
+        r"""
+        Return the matrix of `\operatorname{ad}_x: y \mapsto [x, y]`.
+
+        Its `j`-th column holds the coordinates of `[x, b_j]`.
+        """
+        return self._products(x).T
+
+    def coordinates(self, x):
+        """
+        Return the coordinate vector of the element ``x`` of the Lie algebra.
+
+        INPUT:
+
+        - ``x`` -- an element with a ``gap`` method, or a GAP handle
+
+        This calls GAP, and requires :attr:`basis`.
+        """
+        import numpy
+        from sage.libs.gap.libgap import libgap
+        from sage.rings.integer import Integer
+        if hasattr(x, "gap"):
+            x = x.gap()
+        coefficients = libgap.Coefficients(self.basis, x).sage()
+        bound = numpy.iinfo(numpy.int64).max
+        if all(type(c) is Integer and -bound <= c <= bound for c in coefficients):
+            return numpy.array(coefficients, dtype=numpy.int64)
+        return numpy.array(coefficients, dtype=object)
@@ -0,0 +1,393 @@
+r"""
+Prebuilt snapshots of the semantic annotations
+
+A snapshot is a compact binary file holding all the harvested
+annotations: for each annotated category, its key and its MMT and
+GAP alignments and, for each annotated method, its name, its MMT and
+GAP names, its codomain (as rendered by
+:func:`sage.misc.sage_typing.type_repr`) and its arity. Categories
+are identified by their key, that is the qualified name
+``module.qualname`` of their class, as in
+:mod:`sage_annotations.export`, since several categories may have
+the same name.
+
+Building a snapshot requires the Sage library; loading and querying
+it does not. A loaded snapshot is memory mapped read-only, so that
+processes forked from the same parent share its pages; lookups by
+GAP or MMT name, and of categories by key, are done by binary search
+into indices stored in the file.
+
+A snapshot records the hashes of the annotation source files it was
+built from, which :meth:`Snapshot.is_stale` compares with the current
+ones.
+
+Importing this module does not import the Sage library, unless it
+is imported already (see :mod:`sage_annotations`).
+
+EXAMPLES::
+
+    sage: from sage_annotations import snapshot
+    sage: filename = tmp_filename(ext=".snapshot")
+    sage: snapshot.build(filename)
+    sage: S = snapshot.load(filename)
+    sage: S.is_stale()
+    False
+    sage: S.methods_by_gap("GreensDClasses")
+    [MethodRecord(category='sage.categories.finite_semigroups.FiniteSemigroups',
+                  nested_class='ParentMethods', name='d_classes',
+                  gap='GreensDClasses', mmt=None, codomain='Facade[Facade[Self]]', arity=1,
+                  extra={'cost': 'expensive'})]
+    sage: S.category("sage.categories.semigroups.Semigroups")
+    CategoryRecord(module='sage.categories.semigroups', qualname='Semigroups', name='Semigroups',
+                   mmt='Semigroup', gap='IsAssociative', gap_sub=None, gap_super=None,
+                   gap_negation=None, variant='multiplicative', extra={})
+
+The file format is (all integers are little endian):
+
+- a header: the magic string ``SAGESEMA``, the format version, the
+  number of strings, source files, categories, methods, entries in
+  the GAP index and entries in the MMT index (unsigned 32 bits each);
+- the offsets of the strings in the string pool (``#strings+1``
+  unsigned 32 bits);
+- the source files: path and SHA-256 digest;
+- the categories and then the methods, as fixed size records whose
+  string fields are indices in the string pool (``NONE`` for ``None``);
+- the category index: the indices of the categories, sorted by key;
+- the GAP and MMT indices: the indices of the methods with a GAP
+  (resp. MMT) name, sorted by that name;
+- the string pool: UTF-8 encoded strings.
+"""
+
+import bisect
+import collections
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+MAGIC = b"SAGESEMA"
+VERSION = 2
+NONE = 0xFFFFFFFF
+
+HEADER   = struct.Struct("<8s7I")
+OFFSET   = struct.Struct("<I")
+SOURCE   = struct.Struct("<I32s")
+CATEGORY = struct.Struct("<10I")
+METHOD   = struct.Struct("<6IiI")
+
+CategoryRecord = collections.namedtuple("CategoryRecord",
+    ["module", "qualname", "name", "mmt", "gap", "gap_sub", "gap_super", "gap_negation", "variant", "extra"])
+MethodRecord = collections.namedtuple("MethodRecord",
+    ["category", "nested_class", "name", "gap", "mmt", "codomain", "arity", "extra"])
+
+category_fields = ["mmt", "gap", "gap_sub", "gap_super", "gap_negation", "variant"]
+method_fields = ["gap", "mmt", "codomain", "argspec", "arity"]
+
+class StaleSnapshotError(ValueError):
+    """
+    Raised when loading a snapshot built from outdated annotations.
+    """
+
+def source_hashes():
+    """
+    Return the SHA-256 digests of the annotation source files.
+
+    OUTPUT: a dictionary mapping paths relative to the
+    :mod:`sage_annotations` package to digests
+
+    EXAMPLES::
+
+        sage: from sage_annotations.snapshot import source_hashes
+        sage: len(source_hashes()["categories/semigroups.py"])
+        32
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = {}
+    for package in ["misc", "categories"]:
+        for filename in sorted(os.listdir(os.path.join(here, package))):
+            if not filename.endswith(".py"):
+                continue
+            with open(os.path.join(here, package, filename), "rb") as f:
+                result[package + "/" + filename] = hashlib.sha256(f.read()).digest()
+    return result
+
+def _extra(semantic, fields):
+    """
+    Return the other entries of ``semantic`` with a simple value, as a JSON string.
+    """
+    extra = {key: value for (key, value) in semantic.items()
+             if key not in fields and isinstance(value, (str, int, float, bool))}
+    if not extra:
+        return None
+    return json.dumps(extra, sort_keys=True)
+
+def build(filename):
+    """
+    Build a snapshot of all the annotations and write it to ``filename``.
+
+    This loads all the annotations, which requires the Sage library.
+    The file is written atomically, so that processes having the
+    previous version mapped are not disturbed.
+    """
+    import sage_annotations
+    sage_annotations.load_all()
+    from sage.misc.sage_typing import annotated_categories, annotated_methods, type_repr
+
+    strings = {}
+    def string(s):
+        if s is None:
+            return NONE
+        try:
+            return strings[s]
+        except KeyError:
+            strings[s] = len(strings)
+            return strings[s]
+
+    sources = [(string(path), digest) for (path, digest) in sorted(source_hashes().items())]
+
+    categories = []
+    category_index = {}
+    category_keys = []
+    for cls in annotated_categories:
+        if cls in category_index:
+            continue
+        category_index[cls] = len(categories)
+        category_keys.append(((cls.__module__ + "." + cls.__qualname__).encode("utf-8"), len(categories)))
+        semantic = cls.__dict__.get("_semantic", {})
+        categories.append([string(cls.__module__), string(cls.__qualname__), string(cls.__name__)] +
+                          [string(semantic.get(field)) for field in category_fields] +
+                          [string(_extra(semantic, category_fields))])
+    category_keys.sort()
+
+    methods = []
+    gap_names = []
+    mmt_names = []
+    for (cls, nested_class, name, semantic) in annotated_methods(category_index):
+        codomain = semantic.get("codomain")
+        if codomain is not None:
+            codomain = type_repr(codomain)
+        if semantic.get("gap") is not None:
+            gap_names.append((semantic["gap"].encode("utf-8"), len(methods)))
+        if semantic.get("mmt") is not None:
+            mmt_names.append((semantic["mmt"].encode("utf-8"), len(methods)))
+        methods.append((category_index[cls], string(nested_class), string(name),
+                        string(semantic.get("gap")), string(semantic.get("mmt")),
+                        string(codomain), semantic.get("arity", -1),
+                        string(_extra(semantic, method_fields))))
+    gap_names.sort()
+    mmt_names.sort()
+
+    pool = [s.encode("utf-8") for s in sorted(strings, key=strings.get)]
+    data = [HEADER.pack(MAGIC, VERSION, len(pool), len(sources), len(categories),
+                        len(methods), len(gap_names), len(mmt_names))]
+    offset = 0
+    for s in pool:
+        data.append(OFFSET.pack(offset))
+        offset += len(s)
+    data.append(OFFSET.pack(offset))
+    data.extend(SOURCE.pack(*source) for source in sources)
+    data.extend(CATEGORY.pack(*category) for category in categories)
+    data.extend(METHOD.pack(*method) for method in methods)
+    data.extend(OFFSET.pack(i) for (key, i) in category_keys)
+    data.extend(OFFSET.pack(i) for (key, i) in gap_names)
+    data.extend(OFFSET.pack(i) for (key, i) in mmt_names)
+    data.extend(pool)
+
+    tmp = "{}.{}.tmp".format(filename, os.getpid())
+    with open(tmp, "wb") as f:
+        f.write(b"".join(data))
+    os.replace(tmp, filename)
+
+class _SortedKeys(object):
+    """
+    The (encoded) keys of the categories, sorted, as a sequence for :mod:`bisect`.
+    """
+    def __init__(self, snapshot, offset, length):
+        self._snapshot = snapshot
+        self._offset = offset
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def category(self, i):
+        return OFFSET.unpack_from(self._snapshot._mmap, self._offset + i * OFFSET.size)[0]
+
+    def __getitem__(self, i):
+        snapshot = self._snapshot
+        record = CATEGORY.unpack_from(snapshot._mmap, snapshot._categories_offset + self.category(i) * CATEGORY.size)
+        return snapshot._bytes(record[0]) + b"." + snapshot._bytes(record[1])
+
+class _SortedNames(object):
+    """
+    The (encoded) names of the methods in an index, as a sequence for :mod:`bisect`.
+    """
+    def __init__(self, snapshot, offset, length, field):
+        self._snapshot = snapshot
+        self._offset = offset
+        self._length = length
+        self._field = field
+
+    def __len__(self):
+        return self._length
+
+    def method(self, i):
+        return OFFSET.unpack_from(self._snapshot._mmap, self._offset + i * OFFSET.size)[0]
+
+    def __getitem__(self, i):
+        snapshot = self._snapshot
+        record = METHOD.unpack_from(snapshot._mmap, snapshot._methods_offset + self.method(i) * METHOD.size)
+        return snapshot._bytes(record[self._field])
+
+class Snapshot(object):
+    """
+    A read-only, memory mapped, snapshot of the annotations
+
+    See :mod:`sage_annotations.snapshot` and :func:`load`.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self._mmap, 0)
+        if header[0] != MAGIC:
+            raise ValueError("{} is not a snapshot of semantic annotations".format(filename))
+        if header[1] != VERSION:
+            raise ValueError("{} has version {} of the snapshot format; expected version {}"
+                             .format(filename, header[1], VERSION))
+        (self._n_strings, self._n_sources, self._n_categories,
+         self._n_methods, n_gap, n_mmt) = header[2:]
+        offset = HEADER.size
+        self._offsets_offset = offset
+        offset += (self._n_strings + 1) * OFFSET.size
+        self._sources_offset = offset
+        offset += self._n_sources * SOURCE.size
+        self._categories_offset = offset
+        offset += self._n_categories * CATEGORY.size
+        self._methods_offset = offset
+        offset += self._n_methods * METHOD.size
+        self._category_index = _SortedKeys(self, offset, self._n_categories)
+        offset += self._n_categories * OFFSET.size
+        self._gap_index = _SortedNames(self, offset, n_gap, 3)
+        offset += n_gap * OFFSET.size
+        self._mmt_index = _SortedNames(self, offset, n_mmt, 4)
+        offset += n_mmt * OFFSET.size
+        self._pool_offset = offset
+
+    def close(self):
+        self._mmap.close()
+
+    def _bytes(self, i):
+        if i == NONE:
+            return None
+        (start, end) = struct.unpack_from("<2I", self._mmap, self._offsets_offset + i * OFFSET.size)
+        return self._mmap[self._pool_offset + start: self._pool_offset + end]
+
+    def _string(self, i):
+        if i == NONE:
+            return None
+        return self._bytes(i).decode("utf-8")
+
+    def _extra(self, i):
+        if i == NONE:
+            return {}
+        return json.loads(self._string(i))
+
+    def sources(self):
+        """
+        Return the digests of the source files this snapshot was built from.
+        """
+        return dict((self._string(path), digest)
+                    for (path, digest) in SOURCE.iter_unpack(
+                        self._mmap[self._sources_offset:self._categories_offset]))
+
+    def is_stale(self):
+        """
+        Return whether the annotation sources changed since this snapshot was built.
+        """
+        return self.sources() != source_hashes()
+
+    def _category(self, i):
+        record = CATEGORY.unpack_from(self._mmap, self._categories_offset + i * CATEGORY.size)
+        return CategoryRecord(*([self._string(s) for s in record[:-1]] + [self._extra(record[-1])]))
+
+    def _method(self, i):
+        record = METHOD.unpack_from(self._mmap, self._methods_offset + i * METHOD.size)
+        category = CATEGORY.unpack_from(self._mmap, self._categories_offset + record[0] * CATEGORY.size)
+        arity = record[6] if record[6] >= 0 else None
+        return MethodRecord(self._string(category[0]) + "." + self._string(category[1]),
+                            *([self._string(s) for s in record[1:6]] + [arity, self._extra(record[7])]))
+
+    def categories(self):
+        """
+        Iterate through the annotated categories, as :class:`CategoryRecord`'s.
+        """
+        for i in range(self._n_categories):
+            yield self._category(i)
+
+    def category(self, key):
+        """
+        Return the annotations of the category with key ``key``.
+
+        INPUT:
+
+        - ``key`` -- the qualified name ``module.qualname`` of the
+          category class
+        """
+        index = self._category_index
+        encoded = key.encode("utf-8")
+        i = bisect.bisect_left(index, encoded)
+        if i < len(index) and index[i] == encoded:
+            return self._category(index.category(i))
+        raise KeyError(key)
+
+    def methods(self):
+        """
+        Iterate through the annotated methods, as :class:`MethodRecord`'s.
+        """
+        for i in range(self._n_methods):
+            yield self._method(i)
+
+    def _lookup(self, index, name):
+        key = name.encode("utf-8")
+        i = bisect.bisect_left(index, key)
+        result = []
+        while i < len(index) and index[i] == key:
+            result.append(self._method(index.method(i)))
+            i += 1
+        return result
+
+    def methods_by_gap(self, name):
+        """
+        Return the methods aligned with the GAP operation ``name``.
+        """
+        return self._lookup(self._gap_index, name)
+
+    def methods_by_mmt(self, name):
+        """
+        Return the methods aligned with the MMT symbol ``name``.
+        """
+        return self._lookup(self._mmt_index, name)
+
+def load(filename, check=True):
+    """
+    Load the snapshot in ``filename``.
+
+    INPUT:
+
+    - ``check`` -- a boolean (default: ``True``): whether to raise a
+      :class:`StaleSnapshotError` if the annotation sources changed
+      since the snapshot was built
+    """
+    snapshot = Snapshot(filename)
+    if check and snapshot.is_stale():
+        snapshot.close()
+        raise StaleSnapshotError("{} is out of date with respect to the annotations".format(filename))
+    return snapshot
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m sage_annotations.snapshot FILENAME")
+    build(sys.argv[1])